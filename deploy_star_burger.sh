@@ -27,6 +27,12 @@ venv/bin/python manage.py collectstatic --no-input
 echo -e "\n${BOLD}Применение миграций...${BOLD_END}"
 venv/bin/python manage.py migrate --no-input
 
+echo -e "\n${BOLD}Проверка настроек...${BOLD_END}"
+# nginx appends the client address to X-Forwarded-For, see README.md
+if ! grep -q '^API_RATE_LIMIT_PROXIES=' star_burger/.env; then
+  echo 'API_RATE_LIMIT_PROXIES=1' >> star_burger/.env
+fi
+
 echo -e "\n${BOLD}Перезапуск сервисов Systemd...${BOLD_END}"
 systemctl restart starburger.service
 systemctl reload nginx.service
@@ -6,6 +6,7 @@ from django.utils.http import url_has_allowed_host_and_scheme
 
 from django.conf import settings
 
+from .images import get_variant_url
 from .models import (Order, OrderItem, Product, ProductCategory, Restaurant,
                      RestaurantMenuItem)
 
@@ -92,7 +93,8 @@ class ProductAdmin(admin.ModelAdmin):
         if not obj.image:
             return 'выберите картинку'
         return format_html('<img src="{url}" style="max-height: 200px;"/>',
-                           url=obj.image.url)
+                           url=get_variant_url(obj.image_variants, 320)
+                           or obj.image.url)
     get_image_preview.short_description = 'превью'
 
     def get_image_list_preview(self, obj):
@@ -101,7 +103,8 @@ class ProductAdmin(admin.ModelAdmin):
         edit_url = reverse('admin:foodcartapp_product_change', args=(obj.id,))
         return format_html('<a href="{edit_url}"><img src="{src}" style="max-height: 50px;"/></a>',
                            edit_url=edit_url,
-                           src=obj.image.url)
+                           src=get_variant_url(obj.image_variants, 160)
+                           or obj.image.url)
     get_image_list_preview.short_description = 'превью'
 
 
@@ -0,0 +1,193 @@
+from uuid import uuid4
+
+from django.core.cache import cache
+
+from .models import Restaurant, RestaurantMenuItem
+
+AVAILABILITY_CACHE_KEY = 'foodcartapp:availability'
+AVAILABILITY_VERSION_KEY = 'foodcartapp:availability:version'
+AVAILABILITY_LOCK_KEY = 'foodcartapp:availability:lock'
+AVAILABILITY_INVALIDATED_KEY = 'foodcartapp:availability:invalidated'
+AVAILABILITY_LOCK_TIMEOUT = 10
+
+_local_availability = None
+
+
+class RestaurantAvailability:
+    def __init__(self, restaurant_ids, product_masks, version=None):
+        self.restaurant_ids = list(restaurant_ids)
+        self.slots = {
+            restaurant_id: slot
+            for slot, restaurant_id in enumerate(self.restaurant_ids)
+            if restaurant_id is not None
+        }
+        self.product_masks = product_masks
+        self.version = version
+
+    @classmethod
+    def build(cls, version=None):
+        restaurant_ids = Restaurant.objects.order_by('id').values_list(
+            'id', flat=True
+        )
+        availability = cls(restaurant_ids, {}, version)
+        available_items = (
+            RestaurantMenuItem.objects
+            .filter(availability=True)
+            .values_list('product_id', 'restaurant_id')
+        )
+        for product_id, restaurant_id in available_items:
+            availability.set_available(product_id, restaurant_id)
+        return availability
+
+    def set_available(self, product_id, restaurant_id):
+        slot = self.slots.get(restaurant_id)
+        if slot is None:
+            return
+        self.product_masks[product_id] = (
+            self.product_masks.get(product_id, 0) | 1 << slot
+        )
+
+    def update_product(self, product_id, restaurant_ids):
+        self.product_masks.pop(product_id, None)
+        for restaurant_id in restaurant_ids:
+            self.set_available(product_id, restaurant_id)
+
+    def add_restaurant(self, restaurant_id):
+        if restaurant_id in self.slots:
+            return
+        try:
+            slot = self.restaurant_ids.index(None)
+            self.restaurant_ids[slot] = restaurant_id
+        except ValueError:
+            slot = len(self.restaurant_ids)
+            self.restaurant_ids.append(restaurant_id)
+        self.slots[restaurant_id] = slot
+
+    def remove_restaurant(self, restaurant_id):
+        slot = self.slots.pop(restaurant_id, None)
+        if slot is None:
+            return
+        self.restaurant_ids[slot] = None
+        for product_id, mask in list(self.product_masks.items()):
+            mask &= ~(1 << slot)
+            if mask:
+                self.product_masks[product_id] = mask
+            else:
+                del self.product_masks[product_id]
+
+    def get_mask(self, product_ids):
+        mask = None
+        for product_id in set(product_ids):
+            product_mask = self.product_masks.get(product_id, 0)
+            mask = product_mask if mask is None else mask & product_mask
+            if not mask:
+                break
+        return mask or 0
+
+    def decode(self, mask):
+        restaurant_ids = set()
+        while mask:
+            lowest_bit = mask & -mask
+            restaurant_ids.add(self.restaurant_ids[lowest_bit.bit_length() - 1])
+            mask ^= lowest_bit
+        return restaurant_ids
+
+    def restaurants_for(self, product_ids):
+        return self.decode(self.get_mask(product_ids))
+
+    def match_orders(self, orders):
+        return {
+            order.id: self.restaurants_for(
+                item.product_id for item in order.items.all()
+            )
+            for order in orders
+        }
+
+
+def bump_availability_version():
+    # a counter would start over after the cache is flushed and make
+    # copies kept by the processes look current again
+    version = uuid4().hex
+    cache.set(AVAILABILITY_VERSION_KEY, version, timeout=None)
+    return version
+
+
+def rebuild_restaurant_availability():
+    availability = RestaurantAvailability.build(
+        version=bump_availability_version()
+    )
+    cache.set(AVAILABILITY_CACHE_KEY, availability, timeout=None)
+    return availability
+
+
+def get_restaurant_availability():
+    global _local_availability
+    version = cache.get(AVAILABILITY_VERSION_KEY)
+    if _local_availability and _local_availability.version == version:
+        return _local_availability
+
+    availability = cache.get(AVAILABILITY_CACHE_KEY)
+    if not availability or availability.version != version:
+        availability = rebuild_restaurant_availability()
+    _local_availability = availability
+    return availability
+
+
+def invalidate_restaurant_availability():
+    # the mark tells a writer holding the lock that its copy misses a change
+    cache.set(AVAILABILITY_INVALIDATED_KEY, uuid4().hex, timeout=None)
+    cache.delete(AVAILABILITY_CACHE_KEY)
+    bump_availability_version()
+
+
+def update_restaurant_availability(update):
+    if not cache.add(AVAILABILITY_LOCK_KEY, 1, AVAILABILITY_LOCK_TIMEOUT):
+        # somebody else is updating the shared copy, so the safest thing
+        # is to drop it and let the next reader rebuild it from the database
+        invalidate_restaurant_availability()
+        return
+    try:
+        invalidated = cache.get(AVAILABILITY_INVALIDATED_KEY)
+        version = cache.get(AVAILABILITY_VERSION_KEY)
+        availability = cache.get(AVAILABILITY_CACHE_KEY)
+        if not availability or availability.version != version:
+            invalidate_restaurant_availability()
+            return
+        update(availability)
+        if cache.get(AVAILABILITY_VERSION_KEY) != version:
+            invalidate_restaurant_availability()
+            return
+        availability.version = uuid4().hex
+        cache.set(AVAILABILITY_CACHE_KEY, availability, timeout=None)
+        cache.set(AVAILABILITY_VERSION_KEY, availability.version, timeout=None)
+        # the copy could be dropped by another writer between the version
+        # check and the writes above, then its change is missing from ours
+        if cache.get(AVAILABILITY_INVALIDATED_KEY) != invalidated:
+            invalidate_restaurant_availability()
+    finally:
+        cache.delete(AVAILABILITY_LOCK_KEY)
+
+
+def refresh_product_availability(product_id):
+    restaurant_ids = list(
+        RestaurantMenuItem.objects
+        .filter(product_id=product_id, availability=True)
+        .values_list('restaurant_id', flat=True)
+    )
+    update_restaurant_availability(
+        lambda availability: availability.update_product(
+            product_id, restaurant_ids
+        )
+    )
+
+
+def add_restaurant_availability(restaurant_id):
+    update_restaurant_availability(
+        lambda availability: availability.add_restaurant(restaurant_id)
+    )
+
+
+def remove_restaurant_availability(restaurant_id):
+    update_restaurant_availability(
+        lambda availability: availability.remove_restaurant(restaurant_id)
+    )
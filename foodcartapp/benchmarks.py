@@ -0,0 +1,57 @@
+import random
+import time
+
+from .models import Product, ProductCategory, Restaurant, RestaurantMenuItem
+
+
+def seed_catalog(products_count, restaurants_count, available_share=0.5,
+                 seed=0):
+    # bulk_create skips signals, so the seeded rows never reach caches
+    randomizer = random.Random(seed)
+    category = ProductCategory.objects.create(name='benchmark')
+    Restaurant.objects.bulk_create(
+        Restaurant(name=f'benchmark {number}')
+        for number in range(restaurants_count)
+    )
+    Product.objects.bulk_create(
+        Product(
+            name=f'benchmark {number}',
+            category=category,
+            price=randomizer.randint(100, 1000),
+            image='benchmark.jpg',
+        )
+        for number in range(products_count)
+    )
+    # not every backend returns primary keys from bulk_create
+    restaurant_ids = list(
+        Restaurant.objects
+        .order_by('-id')
+        .values_list('id', flat=True)[:restaurants_count]
+    )
+    product_ids = list(
+        Product.objects
+        .filter(category=category)
+        .values_list('id', flat=True)
+    )
+    RestaurantMenuItem.objects.bulk_create(
+        (
+            RestaurantMenuItem(
+                restaurant_id=restaurant_id,
+                product_id=product_id,
+                availability=randomizer.random() < available_share,
+            )
+            for product_id in product_ids
+            for restaurant_id in restaurant_ids
+        ),
+        batch_size=5000,
+    )
+    return category
+
+
+def measure(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started_at)
+    return min(timings), sum(timings) / len(timings)
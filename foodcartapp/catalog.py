@@ -0,0 +1,323 @@
+import json
+import time
+from datetime import datetime, timedelta, timezone
+from hashlib import md5
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.timezone import now
+from rest_framework.serializers import (BooleanField, CharField,
+                                        IntegerField, Serializer,
+                                        ValidationError)
+
+from .images import get_srcset
+from .models import (CatalogTombstone, Product, ProductCategory,
+                     RestaurantMenuItem)
+from .payloads import (IDENTITY, get_payload_variant, is_pretty,
+                       render_payload)
+
+CATALOG_VERSION_KEY = 'foodcartapp:catalog:version'
+CATALOG_PAYLOAD_KEY = 'foodcartapp:catalog:payload'
+
+
+def get_new_catalog_version():
+    return uuid4().hex, time.time()
+
+
+def bump_catalog_version():
+    catalog_version = get_new_catalog_version()
+    cache.set(CATALOG_VERSION_KEY, catalog_version, timeout=None)
+    return catalog_version
+
+
+def get_catalog_state(request):
+    # one cache round trip serves both the conditional check and the body
+    if not hasattr(request, '_catalog_state'):
+        state = cache.get_many([CATALOG_VERSION_KEY, CATALOG_PAYLOAD_KEY])
+        if CATALOG_VERSION_KEY not in state:
+            state[CATALOG_VERSION_KEY] = get_catalog_version()
+        request._catalog_state = state
+    return request._catalog_state
+
+
+class CatalogQuerySerializer(Serializer):
+    category = IntegerField(required=False, min_value=1)
+    restaurant = IntegerField(required=False, min_value=1)
+    special_status = BooleanField(required=False)
+    ids = CharField(required=False)
+    fields = CharField(required=False)
+    cursor = IntegerField(required=False, min_value=0)
+    limit = IntegerField(required=False, min_value=1)
+
+    def validate_ids(self, value):
+        try:
+            return [int(product_id) for product_id in value.split(',')]
+        except ValueError:
+            raise ValidationError('Ожидается список id через запятую.')
+
+    def validate_fields(self, value):
+        fields = value.split(',')
+        unknown_fields = set(fields) - set(PRODUCT_FIELDS)
+        if unknown_fields:
+            raise ValidationError(
+                f'Неизвестные поля: {", ".join(sorted(unknown_fields))}.'
+            )
+        return fields
+
+    def validate_limit(self, value):
+        return min(value, settings.PRODUCTS_PAGE_SIZE_MAX)
+
+    def validate(self, attrs):
+        if 'cursor' in attrs and 'limit' not in attrs:
+            attrs['limit'] = settings.PRODUCTS_PAGE_SIZE
+        return attrs
+
+
+def get_catalog_query(request):
+    if not hasattr(request, '_catalog_query'):
+        params = request.GET.dict()
+        params.pop('pretty', None)
+        serializer = CatalogQuerySerializer(data=params)
+        serializer.is_valid()
+        request._catalog_query = serializer
+    return request._catalog_query
+
+
+def get_catalog_etag(request):
+    query = get_catalog_query(request)
+    if query.errors:
+        return None
+    version, _ = get_catalog_state(request)[CATALOG_VERSION_KEY]
+    if not query.validated_data:
+        # each encoding is its own representation and needs its own strong tag
+        return f'catalog-{version}-{get_payload_variant(request)}'
+
+    query_digest = md5(
+        json.dumps(query.validated_data, sort_keys=True).encode('utf-8')
+    ).hexdigest()
+    variant = 'pretty' if is_pretty(request) else IDENTITY
+    return f'catalog-{version}-{query_digest}-{variant}'
+
+
+def get_catalog_last_modified(request):
+    if get_catalog_query(request).errors:
+        return None
+    _, modified_at = get_catalog_state(request)[CATALOG_VERSION_KEY]
+    return datetime.fromtimestamp(int(modified_at), tz=timezone.utc)
+
+
+def serialize_product(product):
+    return {
+        'id': product.id,
+        'name': product.name,
+        'price': product.price,
+        'special_status': product.special_status,
+        'description': product.description,
+        'category': {
+            'id': product.category.id,
+            'name': product.category.name,
+        } if product.category else None,
+        'image': product.image.url,
+        'image_srcset': get_srcset(product.image_variants),
+        'restaurant': {
+            'id': product.id,
+            'name': product.name,
+        }
+    }
+
+
+PRODUCT_FIELDS = [
+    'id', 'name', 'price', 'special_status', 'description', 'category',
+    'image', 'image_srcset', 'restaurant',
+]
+
+
+def dump_catalog(products=None, fields=None):
+    if products is None:
+        products = Product.objects.select_related('category').available()
+
+    dumped_products = []
+    for product in products:
+        dumped_product = serialize_product(product)
+        if fields:
+            dumped_product = {field: dumped_product[field] for field in fields}
+        dumped_products.append(dumped_product)
+    return dumped_products
+
+
+def filter_catalog(category=None, restaurant=None, special_status=None,
+                   ids=None):
+    products = Product.objects.available()
+    if category is not None:
+        products = products.filter(category_id=category)
+    if restaurant is not None:
+        products = products.filter(
+            menu_items__restaurant_id=restaurant,
+            menu_items__availability=True,
+        )
+    if special_status is not None:
+        products = products.filter(special_status=special_status)
+    if ids:
+        products = products.filter(id__in=ids)
+    return products
+
+
+def get_catalog_page(products, fields=None, cursor=None, limit=None):
+    products = products.order_by('id')
+    if not fields or 'category' in fields:
+        products = products.select_related('category')
+    if cursor is not None:
+        products = products.filter(id__gt=cursor)
+    if limit is None:
+        return dump_catalog(products, fields), None
+
+    # one extra row tells whether there is a next page
+    page = list(products[:limit + 1])
+    next_cursor = page[limit - 1].id if len(page) > limit else None
+    return dump_catalog(page[:limit], fields), next_cursor
+
+
+def get_catalog_version():
+    catalog_version = cache.get(CATALOG_VERSION_KEY)
+    if not catalog_version:
+        catalog_version = get_new_catalog_version()
+        cache.add(CATALOG_VERSION_KEY, catalog_version, timeout=None)
+        catalog_version = cache.get(CATALOG_VERSION_KEY) or catalog_version
+    return catalog_version
+
+
+def publish_catalog(version=None):
+    if version is None:
+        version, _ = get_catalog_version()
+    # a bump during the dump leaves the payload tagged with the old version,
+    # so it is simply published again
+    payload = render_payload(dump_catalog())
+    cache.set(CATALOG_PAYLOAD_KEY, (version, payload), timeout=None)
+    return payload
+
+
+def get_catalog_payload(request):
+    state = get_catalog_state(request)
+    version, _ = state[CATALOG_VERSION_KEY]
+    published_version, payload = state.get(CATALOG_PAYLOAD_KEY, (None, None))
+    if published_version == version:
+        return payload
+    return publish_catalog(version)
+
+
+class CatalogChangesExpired(ValidationError):
+    pass
+
+
+def get_changes_token(moment):
+    return str(int(moment.timestamp() * 1000000))
+
+
+def parse_changes_token(token):
+    try:
+        since = datetime.fromtimestamp(int(token) / 1000000, tz=timezone.utc)
+    except (TypeError, ValueError, OverflowError, OSError):
+        raise ValidationError('Некорректный токен синхронизации.')
+    oldest_tombstone = now() - timedelta(
+        seconds=settings.CATALOG_TOMBSTONE_TTL
+    )
+    if since < oldest_tombstone:
+        raise CatalogChangesExpired(
+            'Токен устарел, загрузите каталог целиком.'
+        )
+    return since
+
+
+def get_catalog_changes(since=None):
+    synced_at = now()
+    changed_after = {}
+    tombstones = CatalogTombstone.objects.none()
+    if since:
+        # transactions still in flight may commit rows stamped a bit
+        # earlier than the token, so the window overlaps the previous one
+        since -= timedelta(seconds=settings.CATALOG_CHANGES_OVERLAP)
+        changed_after = {'updated_at__gt': since}
+        tombstones = CatalogTombstone.objects.filter(deleted_at__gt=since)
+
+    changed_menu_items = list(
+        RestaurantMenuItem.objects
+        .filter(**changed_after)
+        .values_list('restaurant_id', 'product_id', 'availability')
+    )
+    current_menu_items = {
+        (restaurant_id, product_id)
+        for restaurant_id, product_id, _ in changed_menu_items
+    }
+    deleted_menu_items = {
+        menu_item for menu_item in tombstones
+        .filter(kind=CatalogTombstone.MENU_ITEM)
+        .values_list('restaurant_id', 'product_id')
+        if menu_item not in current_menu_items
+    }
+    changed_categories = ProductCategory.objects.filter(**changed_after)
+
+    changed_product_ids = set(
+        Product.objects.filter(**changed_after).values_list('id', flat=True)
+    )
+    changed_product_ids.update(
+        Product.objects
+        .filter(category__in=changed_categories)
+        .values_list('id', flat=True)
+    )
+    changed_product_ids.update(
+        product_id for _, product_id, _ in changed_menu_items
+    )
+    changed_product_ids.update(
+        product_id for _, product_id in deleted_menu_items
+    )
+
+    products = (
+        Product.objects
+        .available()
+        .filter(id__in=changed_product_ids)
+        .select_related('category')
+        .order_by('id')
+    )
+    dumped_products = dump_catalog(products)
+    removed_product_ids = changed_product_ids - {
+        product['id'] for product in dumped_products
+    }
+    removed_product_ids.update(
+        tombstones
+        .filter(kind=CatalogTombstone.PRODUCT)
+        .values_list('object_id', flat=True)
+    )
+
+    availability = [
+        {
+            'restaurant': restaurant_id,
+            'product': product_id,
+            'availability': is_available,
+        }
+        for restaurant_id, product_id, is_available in changed_menu_items
+    ]
+    availability.extend(
+        {
+            'restaurant': restaurant_id,
+            'product': product_id,
+            'availability': False,
+        }
+        for restaurant_id, product_id in deleted_menu_items
+    )
+
+    return {
+        'token': get_changes_token(synced_at),
+        'products': dumped_products,
+        'removed_products': sorted(removed_product_ids),
+        'categories': [
+            {'id': category.id, 'name': category.name}
+            for category in changed_categories.order_by('id')
+        ],
+        'removed_categories': sorted(
+            tombstones
+            .filter(kind=CatalogTombstone.CATEGORY)
+            .values_list('object_id', flat=True)
+        ),
+        'availability': availability,
+    }
@@ -0,0 +1,86 @@
+import json
+from datetime import timedelta
+from hashlib import sha256
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import OrderIdempotencyKey
+
+MAX_KEY_LENGTH = 255
+
+
+class IdempotencyKeyReused(Exception):
+    pass
+
+
+def get_request_hash(data):
+    return sha256(json.dumps(
+        data, cls=DjangoJSONEncoder, sort_keys=True, ensure_ascii=False,
+    ).encode('utf-8')).hexdigest()
+
+
+def get_cache_key(key):
+    return f'foodcartapp:idempotency:{sha256(key.encode("utf-8")).hexdigest()}'
+
+
+def get_oldest_key_time():
+    return timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+
+
+def check_request_hash(saved_hash, request_hash):
+    if saved_hash != request_hash:
+        raise IdempotencyKeyReused(
+            'Этот Idempotency-Key уже использован для другого заказа.'
+        )
+
+
+def find_saved_response(key, request_hash):
+    saved = cache.get(get_cache_key(key))
+    if saved is None:
+        saved = (
+            OrderIdempotencyKey.objects
+            .filter(key=key, created_at__gte=get_oldest_key_time())
+            .exclude(response=None)
+            .values_list('request_hash', 'response')
+            .first()
+        )
+        if saved is None:
+            return None
+        cache.set(get_cache_key(key), saved, settings.IDEMPOTENCY_KEY_TTL)
+    saved_hash, response = saved
+    check_request_hash(saved_hash, request_hash)
+    return response
+
+
+def run_once(key, request_hash, create):
+    saved_response = find_saved_response(key, request_hash)
+    if saved_response is not None:
+        return saved_response
+
+    OrderIdempotencyKey.objects.filter(
+        key=key, created_at__lt=get_oldest_key_time()
+    ).delete()
+    try:
+        with transaction.atomic():
+            # a concurrent request with the same key waits on the unique
+            # index here until this transaction ends, no table lock needed
+            idempotency_key = OrderIdempotencyKey.objects.create(
+                key=key, request_hash=request_hash,
+            )
+            order, response = create()
+            idempotency_key.order = order
+            idempotency_key.response = response
+            idempotency_key.save(update_fields=['order', 'response'])
+    except IntegrityError:
+        saved_response = find_saved_response(key, request_hash)
+        if saved_response is None:
+            raise
+        return saved_response
+
+    cache.set(get_cache_key(key), (request_hash, response),
+              settings.IDEMPOTENCY_KEY_TTL)
+    return response
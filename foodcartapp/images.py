@@ -0,0 +1,135 @@
+import logging
+from hashlib import sha256
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from PIL import Image, features
+
+from .models import Product
+
+logger = logging.getLogger(__name__)
+
+VARIANTS_DIR = 'products/variants'
+CONTENT_TYPES = {
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+    'WEBP': 'image/webp',
+}
+EXTENSIONS = {
+    'JPEG': 'jpg',
+    'PNG': 'png',
+    'WEBP': 'webp',
+}
+
+
+def get_variant_formats(image):
+    has_alpha = image.mode in ('RGBA', 'LA') or 'transparency' in image.info
+    formats = ['PNG' if has_alpha else 'JPEG']
+    if features.check('webp'):
+        formats.append('WEBP')
+    return formats
+
+
+def get_variant_widths(original_width):
+    widths = sorted(
+        width for width in settings.PRODUCT_IMAGE_WIDTHS
+        if width < original_width
+    )
+    # never upscale, the original size is the largest variant
+    return widths + [original_width]
+
+
+def encode_variant(image, image_format):
+    buffer = BytesIO()
+    if image_format == 'JPEG':
+        image.convert('RGB').save(
+            buffer, 'JPEG', quality=settings.PRODUCT_IMAGE_QUALITY,
+            optimize=True, progressive=True,
+        )
+    elif image_format == 'WEBP':
+        image.save(buffer, 'WEBP', quality=settings.PRODUCT_IMAGE_QUALITY,
+                   method=6)
+    else:
+        image.save(buffer, image_format, optimize=True)
+    return buffer.getvalue()
+
+
+def generate_image_variants(image_file):
+    image_file.open('rb')
+    try:
+        content = image_file.read()
+    finally:
+        image_file.close()
+    content_hash = sha256(content).hexdigest()[:16]
+
+    with Image.open(BytesIO(content)) as original:
+        original.load()
+        formats = get_variant_formats(original)
+        variants = []
+        for width in get_variant_widths(original.width):
+            height = max(round(original.height * width / original.width), 1)
+            resized = original.resize((width, height), Image.LANCZOS)
+            for image_format in formats:
+                # names depend only on the content, so an unchanged image
+                # is never encoded twice and variants can be cached forever
+                name = (
+                    f'{VARIANTS_DIR}/{content_hash}-{width}w.'
+                    f'{EXTENSIONS[image_format]}'
+                )
+                if not default_storage.exists(name):
+                    name = default_storage.save(name, ContentFile(
+                        encode_variant(resized, image_format)
+                    ))
+                variants.append({
+                    'name': name,
+                    'width': width,
+                    'type': CONTENT_TYPES[image_format],
+                })
+    return variants
+
+
+def get_srcset(variants, content_type=None):
+    return [
+        {
+            'url': default_storage.url(variant['name']),
+            'width': variant['width'],
+            'type': variant['type'],
+        }
+        for variant in variants
+        if not content_type or variant['type'] == content_type
+    ]
+
+
+def get_variant_url(variants, min_width):
+    # smallest non-webp variant that is at least min_width wide,
+    # webp is left to srcset-aware clients
+    candidates = sorted(
+        (variant for variant in variants if variant['type'] != 'image/webp'),
+        key=lambda variant: variant['width'],
+    )
+    for variant in candidates:
+        if variant['width'] >= min_width:
+            return default_storage.url(variant['name'])
+    if candidates:
+        return default_storage.url(candidates[-1]['name'])
+    return None
+
+
+def update_product_image_variants(product):
+    variants = []
+    if product.image:
+        try:
+            variants = generate_image_variants(product.image)
+        except OSError:
+            logger.warning('Could not make image variants for product %s',
+                           product.id, exc_info=True)
+            return False
+    # the image may have been replaced while the variants were generated
+    return bool(
+        Product.objects
+        .filter(pk=product.pk, image=product.image.name or '')
+        .update(image_variants=variants, updated_at=timezone.now())
+    )
@@ -0,0 +1,46 @@
+import json
+
+from django.conf import settings
+
+from .intake import bulk_create_orders, make_order_entry
+from .serializers import OrderSerializer
+
+
+def save_chunk(chunk):
+    order_ids = bulk_create_orders([entry for _, entry in chunk])
+    for line_number, entry in chunk:
+        yield {'line': line_number, 'id': order_ids[entry['tracking_id']]}
+
+
+def import_orders(lines, chunk_size=None):
+    # yields one report row per record, memory is bounded by the chunk size
+    chunk_size = chunk_size or settings.ORDER_IMPORT_CHUNK_SIZE
+    chunk = []
+    products = {}
+    for line_number, line in enumerate(lines, start=1):
+        if isinstance(line, bytes):
+            line = line.decode('utf-8', errors='replace')
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError:
+            yield {
+                'line': line_number,
+                'errors': {'non_field_errors': ['Некорректный JSON.']},
+            }
+            continue
+
+        serializer = OrderSerializer(data=data,
+                                     context={'products': products})
+        if not serializer.is_valid():
+            yield {'line': line_number, 'errors': serializer.errors}
+            continue
+        chunk.append((line_number, make_order_entry(serializer.validated_data)))
+        if len(chunk) >= chunk_size:
+            yield from save_chunk(chunk)
+            chunk = []
+            products.clear()
+
+    if chunk:
+        yield from save_chunk(chunk)
@@ -0,0 +1,220 @@
+import fcntl
+import json
+import logging
+import os
+import re
+import time
+from contextlib import contextmanager
+from uuid import uuid4
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from jobs.queue import enqueue_many
+
+from .models import Order, OrderItem, Product
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+CREATED = 'created'
+FAILED = 'failed'
+
+TRACKING_ID_RE = re.compile(r'[0-9a-f]{32}')
+SPOOL_LOCK_NAME = '.lock'
+
+
+def get_spool_dir(*parts):
+    return os.path.join(settings.ORDER_INTAKE_SPOOL_DIR, *parts)
+
+
+def write_durably(path, content):
+    temp_path = f'{path}.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as file:
+        file.write(content)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, path)
+    # the rename itself has to reach the disk too
+    directory = os.open(os.path.dirname(path), os.O_RDONLY)
+    try:
+        os.fsync(directory)
+    finally:
+        os.close(directory)
+
+
+def make_tracking_id():
+    # the arrival time goes first, so spool files sort in arrival order
+    # and are found by the tracking id alone
+    return f'{time.time_ns():016x}{uuid4().hex[:16]}'
+
+
+def get_spool_path(tracking_id, *parts):
+    return get_spool_dir(*parts, f'{tracking_id}.json')
+
+
+def make_order_entry(validated_data):
+    return {
+        'tracking_id': make_tracking_id(),
+        'received_at': timezone.now().isoformat(),
+        'firstname': validated_data['firstname'],
+        'lastname': validated_data['lastname'],
+        'address': validated_data['address'],
+        'phonenumber': validated_data['phonenumber'],
+        'products': [
+            {
+                'product': fields['product'].id,
+                'quantity': fields['quantity'],
+                'price': str(fields['product'].price),
+            }
+            for fields in validated_data['products']
+        ],
+    }
+
+
+def spool_order(validated_data):
+    entry = make_order_entry(validated_data)
+    tracking_id = entry['tracking_id']
+    os.makedirs(get_spool_dir(), exist_ok=True)
+    write_durably(
+        get_spool_path(tracking_id),
+        json.dumps(entry, ensure_ascii=False),
+    )
+    return tracking_id
+
+
+def get_intake_status(tracking_id):
+    if not TRACKING_ID_RE.fullmatch(tracking_id):
+        return None, None
+    # the drainer removes a file only after its order is committed or
+    # the file is moved to the failed ones, so the checks go in this order
+    if os.path.exists(get_spool_path(tracking_id)):
+        return QUEUED, None
+    order_id = (
+        Order.objects
+        .filter(tracking_id=tracking_id)
+        .values_list('id', flat=True)
+        .first()
+    )
+    if order_id:
+        return CREATED, order_id
+    if os.path.exists(get_spool_path(tracking_id, FAILED)):
+        return FAILED, None
+    return None, None
+
+
+@transaction.atomic
+def bulk_create_orders(entries):
+    Order.objects.bulk_create(
+        Order(
+            tracking_id=entry['tracking_id'],
+            created_at=parse_datetime(entry['received_at']),
+            firstname=entry['firstname'],
+            lastname=entry['lastname'],
+            address=entry['address'],
+            phonenumber=entry['phonenumber'],
+        )
+        for entry in entries
+    )
+    # not every backend returns primary keys from bulk_create
+    order_ids = dict(
+        Order.objects
+        .filter(tracking_id__in=[entry['tracking_id'] for entry in entries])
+        .values_list('tracking_id', 'id')
+    )
+    OrderItem.objects.bulk_create(
+        OrderItem(
+            order_id=order_ids[entry['tracking_id']],
+            product_id=fields['product'],
+            quantity=fields['quantity'],
+            price=fields['price'],
+        )
+        for entry in entries
+        for fields in entry['products']
+    )
+    enqueue_many('foodcartapp.geocode_order', [
+        {'order_id': order_ids[entry['tracking_id']]}
+        for entry in entries
+    ])
+    return order_ids
+
+
+def read_spool(batch_size):
+    try:
+        names = sorted(
+            name for name in os.listdir(get_spool_dir())
+            if name.endswith('.json')
+        )[:batch_size]
+    except FileNotFoundError:
+        return []
+
+    entries = []
+    for name in names:
+        path = get_spool_dir(name)
+        with open(path, encoding='utf-8') as file:
+            entries.append((path, json.load(file)))
+    return entries
+
+
+def move_to_failed(path):
+    os.makedirs(get_spool_dir(FAILED), exist_ok=True)
+    os.replace(path, get_spool_dir(FAILED, os.path.basename(path)))
+
+
+@contextmanager
+def lock_spool():
+    # two drainers would read the same files and insert orders twice
+    os.makedirs(get_spool_dir(), exist_ok=True)
+    with open(get_spool_dir(SPOOL_LOCK_NAME), 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def drain_spool(batch_size=None):
+    with lock_spool():
+        return drain_locked_spool(
+            batch_size or settings.ORDER_INTAKE_BATCH_SIZE
+        )
+
+
+def drain_locked_spool(batch_size):
+    entries = read_spool(batch_size)
+    if not entries:
+        return 0
+
+    tracking_ids = [entry['tracking_id'] for _, entry in entries]
+    # a crash between commit and unlink leaves already inserted entries
+    inserted_ids = set(
+        Order.objects
+        .filter(tracking_id__in=tracking_ids)
+        .values_list('tracking_id', flat=True)
+    )
+    known_product_ids = set(Product.objects.filter(id__in={
+        fields['product']
+        for _, entry in entries
+        for fields in entry['products']
+    }).values_list('id', flat=True))
+
+    new_entries = []
+    for path, entry in entries:
+        if entry['tracking_id'] in inserted_ids:
+            continue
+        if any(fields['product'] not in known_product_ids
+               for fields in entry['products']):
+            logger.warning('Order %s refers to deleted products',
+                           entry['tracking_id'])
+            move_to_failed(path)
+            continue
+        new_entries.append(entry)
+
+    bulk_create_orders(new_entries)
+
+    for path, _ in entries:
+        if os.path.exists(path):
+            os.remove(path)
+    return len(entries)
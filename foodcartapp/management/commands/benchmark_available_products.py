@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from foodcartapp.benchmarks import measure, seed_catalog
+from foodcartapp.models import Product, RestaurantMenuItem
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает выборку доступных товаров через pk__in и через EXISTS '
+        'на сгенерированном меню. Данные откатываются после замера'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=1000)
+        parser.add_argument('--restaurants', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            seed_catalog(options['products'], options['restaurants'])
+            if connection.vendor in ['postgresql', 'sqlite']:
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE')
+            self.stdout.write(
+                f'menu items: {RestaurantMenuItem.objects.count()}'
+            )
+
+            querysets = {
+                'pk__in': Product.objects.filter(pk__in=(
+                    RestaurantMenuItem.objects
+                    .filter(availability=True)
+                    .values_list('product')
+                )),
+                'exists': Product.objects.available(),
+            }
+            for name, queryset in querysets.items():
+                best, average = measure(
+                    lambda: list(queryset.values_list('id', flat=True)),
+                    options['repeat'],
+                )
+                self.stdout.write(
+                    f'{name}: best {best * 1000:.1f} ms, '
+                    f'average {average * 1000:.1f} ms'
+                )
+                self.stdout.write(queryset.explain())
+            transaction.set_rollback(True)
@@ -0,0 +1,107 @@
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max, Q
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory
+
+from foodcartapp.benchmarks import seed_catalog
+from foodcartapp.intake import drain_spool
+from foodcartapp.models import (CatalogTombstone, Order, Product,
+                                ProductCategory)
+from foodcartapp.views import register_order
+from jobs.models import Job
+
+BENCHMARK_NAME = 'benchmark'
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает приём заказов сразу в базу и через очередь на диске. '
+        'Созданные заказы и товары удаляются после замера'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=500)
+        parser.add_argument('--items', type=int, default=5)
+
+    def post_orders(self, product_ids, orders_count):
+        factory = APIRequestFactory()
+        payload = {
+            'products': [
+                {'product': product_id, 'quantity': 1}
+                for product_id in product_ids
+            ],
+            'firstname': BENCHMARK_NAME,
+            'lastname': 'Петров',
+            'phonenumber': '+79291000000',
+            'address': 'Москва, Тверская 1',
+        }
+        started_at = time.perf_counter()
+        for _ in range(orders_count):
+            response = register_order(
+                factory.post('/api/order/', payload, format='json')
+            )
+            assert response.status_code in (200, 202), response.data
+        return time.perf_counter() - started_at
+
+    def report(self, name, orders_count, accept_time, total_time):
+        self.stdout.write(
+            f'{name}: accept {accept_time / orders_count * 1000:.2f} ms/order, '
+            f'total {total_time:.2f} s, '
+            f'{orders_count / total_time:.0f} orders/s'
+        )
+
+    def measure(self, product_ids, orders_count):
+        with override_settings(ORDER_INTAKE_MODE='sync'):
+            sync_time = self.post_orders(product_ids, orders_count)
+        self.report('sync', orders_count, sync_time, sync_time)
+
+        with tempfile.TemporaryDirectory() as spool_dir, \
+                override_settings(ORDER_INTAKE_MODE='buffered',
+                                  ORDER_INTAKE_SPOOL_DIR=spool_dir):
+            accept_time = self.post_orders(product_ids, orders_count)
+            started_at = time.perf_counter()
+            while drain_spool():
+                pass
+            drain_time = time.perf_counter() - started_at
+        self.report('buffered', orders_count, accept_time,
+                    accept_time + drain_time)
+        self.stdout.write(f'drain: {drain_time:.2f} s')
+
+    def handle(self, *args, **options):
+        # every order has to be committed on its own, otherwise the commit
+        # cost the buffered mode saves is never measured, so the data is
+        # deleted afterwards instead of being rolled back
+        latest_order_id = Order.objects.aggregate(Max('id'))['id__max'] or 0
+        # products without menu items never show up in the catalog
+        category = seed_catalog(options['items'], restaurants_count=0)
+        product_ids = list(
+            Product.objects
+            .filter(category=category)
+            .values_list('id', flat=True)
+        )
+        try:
+            self.measure(product_ids, options['orders'])
+        finally:
+            with transaction.atomic():
+                order_ids = list(
+                    Order.objects
+                    .filter(id__gt=latest_order_id, firstname=BENCHMARK_NAME)
+                    .values_list('id', flat=True)
+                )
+                for chunk_start in range(0, len(order_ids), 500):
+                    chunk = order_ids[chunk_start:chunk_start + 500]
+                    Job.objects.filter(
+                        task='foodcartapp.geocode_order',
+                        payload__order_id__in=chunk,
+                    ).delete()
+                    Order.objects.filter(id__in=chunk).delete()
+                Product.objects.filter(id__in=product_ids).delete()
+                ProductCategory.objects.filter(id=category.id).delete()
+                CatalogTombstone.objects.filter(
+                    Q(kind=CatalogTombstone.PRODUCT, object_id__in=product_ids)
+                    | Q(kind=CatalogTombstone.CATEGORY, object_id=category.id)
+                ).delete()
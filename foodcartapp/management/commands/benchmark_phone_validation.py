@@ -0,0 +1,103 @@
+import random
+from unittest.mock import patch
+
+import phonenumbers
+from django.core.management.base import BaseCommand
+from phonenumber_field.modelfields import PhoneNumberField
+from phonenumber_field.phonenumber import to_python
+from phonenumber_field.validators import validate_international_phonenumber
+from phonenumbers import PhoneNumberFormat, is_valid_number
+from rest_framework.serializers import CharField, ValidationError
+
+from foodcartapp.benchmarks import measure
+from foodcartapp.models import Order, Product
+from foodcartapp.phones import parsed_phonenumbers
+from foodcartapp.serializers import OrderSerializer
+
+
+class LegacyOrderSerializer(OrderSerializer):
+    # validation as it was before the parsed numbers were cached
+    phonenumber = CharField(max_length=20,
+                            validators=[validate_international_phonenumber])
+
+    def validate_phonenumber(self, value):
+        parsed_phone = phonenumbers.parse(value, "RU")
+        if not is_valid_number(parsed_phone):
+            raise ValidationError('Введен некорректный номер телефона.')
+
+        standardized_phone = phonenumbers.format_number(
+            parsed_phone, PhoneNumberFormat.E164
+        )
+        return standardized_phone
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет проверку заказа с разбором телефона до и после '
+        'кэширования нормализации номеров'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=2000)
+        parser.add_argument('--distinct', type=int, default=200,
+                            help='сколько разных номеров среди заказов')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def validate_orders(self, serializer_class, save_phonenumber, payloads,
+                        products):
+        for payload in payloads:
+            serializer = serializer_class(data=payload,
+                                          context={'products': products})
+            serializer.is_valid(raise_exception=True)
+            save_phonenumber(serializer.validated_data['phonenumber'])
+
+    def save_legacy_phonenumber(self, value):
+        # what the stock field descriptor and get_prep_value do on save
+        PhoneNumberField().get_prep_value(to_python(value))
+
+    def save_phonenumber(self, value):
+        order = Order(phonenumber=value)
+        Order._meta.get_field('phonenumber').get_prep_value(order.phonenumber)
+
+    def handle(self, *args, **options):
+        product = Product.objects.first()
+        if not product:
+            self.stderr.write('Нужен хотя бы один товар в базе')
+            return
+        products = {product.id: product}
+
+        randomizer = random.Random(0)
+        numbers = [
+            f'+7929{randomizer.randint(0, 9999999):07d}'
+            for _ in range(options['distinct'])
+        ]
+        payloads = [
+            {
+                'products': [{'product': product.id, 'quantity': 1}],
+                'firstname': 'Иван',
+                'lastname': 'Петров',
+                'phonenumber': randomizer.choice(numbers),
+                'address': 'Москва, Тверская 1',
+            }
+            for _ in range(options['orders'])
+        ]
+
+        variants = [
+            ('before', LegacyOrderSerializer, self.save_legacy_phonenumber),
+            ('after', OrderSerializer, self.save_phonenumber),
+        ]
+        for name, serializer_class, save_phonenumber in variants:
+            parsed_phonenumbers.clear()
+            with patch('phonenumbers.parse',
+                       wraps=phonenumbers.parse) as parse:
+                best, average = measure(
+                    lambda: self.validate_orders(serializer_class,
+                                                 save_phonenumber, payloads,
+                                                 products),
+                    options['repeat'],
+                )
+            self.stdout.write(
+                f'{name}: best {best / len(payloads) * 1000000:.1f} us/order, '
+                f'average {average / len(payloads) * 1000000:.1f} us/order, '
+                f'{parse.call_count} parses'
+            )
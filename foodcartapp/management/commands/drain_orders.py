@@ -0,0 +1,53 @@
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from foodcartapp.intake import drain_spool
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит заказы, принятые в режиме ORDER_INTAKE_MODE=buffered, '
+        'из очереди на диске в базу данных'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.ORDER_INTAKE_BATCH_SIZE,
+            help='сколько заказов вставлять за одну транзакцию',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=settings.ORDER_INTAKE_POLL_INTERVAL,
+            help='пауза в секундах, если очередь пуста',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='разобрать очередь и выйти',
+        )
+
+    def handle(self, *args, **options):
+        stop_event = threading.Event()
+
+        def stop(signum, frame):
+            stop_event.set()
+
+        signal.signal(signal.SIGINT, stop)
+        signal.signal(signal.SIGTERM, stop)
+
+        while not stop_event.is_set():
+            close_old_connections()
+            drained = drain_spool(options['batch_size'])
+            if drained:
+                self.stdout.write(f'Разобрано заказов из очереди: {drained}')
+                continue
+            if options['once']:
+                break
+            stop_event.wait(options['poll_interval'])
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+
+from foodcartapp.images import update_product_image_variants
+from foodcartapp.models import Product
+from foodcartapp.tasks import (schedule_catalog_publishing,
+                               schedule_image_variants)
+
+
+class Command(BaseCommand):
+    help = 'Делает уменьшенные копии и WebP для картинок товаров'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='пересоздать копии и у товаров, где они уже есть',
+        )
+        parser.add_argument(
+            '--enqueue',
+            action='store_true',
+            help='не обрабатывать картинки сразу, а поставить задачи '
+                 'для run_workers',
+        )
+
+    def handle(self, *args, **options):
+        products = Product.objects.exclude(image='').order_by('id')
+        if not options['force']:
+            products = products.filter(image_variants=[])
+
+        updated = 0
+        for product in products.only('id', 'image').iterator():
+            if options['enqueue']:
+                schedule_image_variants(product.id)
+                continue
+            if update_product_image_variants(product):
+                updated += 1
+            else:
+                self.stderr.write(f'Пропущен товар id={product.id}')
+
+        if options['enqueue']:
+            self.stdout.write('Задачи поставлены в очередь')
+            return
+        if updated:
+            schedule_catalog_publishing()
+        self.stdout.write(f'Обработано товаров: {updated}')
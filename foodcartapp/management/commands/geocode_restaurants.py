@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from foodcartapp.models import Restaurant
+from foodcartapp.tasks import schedule_geocode_restaurant
+
+
+class Command(BaseCommand):
+    help = 'Ставит в очередь геокодирование ресторанов без координат'
+
+    def handle(self, *args, **options):
+        restaurant_ids = (
+            Restaurant.objects
+            .filter(location__isnull=True)
+            .exclude(address__regex=r'^\s*$')
+            .values_list('id', flat=True)
+        )
+        scheduled = 0
+        for restaurant_id in restaurant_ids.iterator():
+            schedule_geocode_restaurant(restaurant_id)
+            scheduled += 1
+        self.stdout.write(f'Поставлено задач: {scheduled}')
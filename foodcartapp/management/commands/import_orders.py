@@ -0,0 +1,52 @@
+import json
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, OutputWrapper
+
+from foodcartapp.imports import import_orders
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает заказы партнёров из файла JSON Lines, по заказу на строку, '
+        'и печатает отчёт по каждой строке'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='файл с заказами или - для stdin')
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=settings.ORDER_IMPORT_CHUNK_SIZE,
+            help='сколько заказов вставлять за одну транзакцию',
+        )
+        parser.add_argument(
+            '--report',
+            help='куда записать отчёт, по умолчанию в stdout',
+        )
+
+    def handle(self, *args, **options):
+        source = sys.stdin
+        if options['path'] != '-':
+            source = open(options['path'], encoding='utf-8')
+        report = self.stdout
+        if options['report']:
+            report = OutputWrapper(
+                open(options['report'], 'w', encoding='utf-8')
+            )
+
+        imported = failed = 0
+        try:
+            for row in import_orders(source, options['chunk_size']):
+                if 'errors' in row:
+                    failed += 1
+                else:
+                    imported += 1
+                report.write(json.dumps(row, ensure_ascii=False))
+        finally:
+            if source is not sys.stdin:
+                source.close()
+            if report is not self.stdout:
+                report.close()
+        self.stderr.write(f'Загружено заказов: {imported}, с ошибками: {failed}')
@@ -0,0 +1,20 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from foodcartapp.models import CatalogTombstone
+
+
+class Command(BaseCommand):
+    help = 'Удаляет записи об удалённых товарах старше CATALOG_TOMBSTONE_TTL'
+
+    def handle(self, *args, **options):
+        oldest_tombstone = timezone.now() - timedelta(
+            seconds=settings.CATALOG_TOMBSTONE_TTL
+        )
+        deleted, _ = CatalogTombstone.objects.filter(
+            deleted_at__lt=oldest_tombstone
+        ).delete()
+        self.stdout.write(f'Удалено записей: {deleted}')
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from foodcartapp.idempotency import get_oldest_key_time
+from foodcartapp.models import OrderIdempotencyKey
+
+
+class Command(BaseCommand):
+    help = 'Удаляет ключи идемпотентности старше IDEMPOTENCY_KEY_TTL'
+
+    def handle(self, *args, **options):
+        deleted, _ = OrderIdempotencyKey.objects.filter(
+            created_at__lt=get_oldest_key_time()
+        ).delete()
+        self.stdout.write(f'Удалено ключей: {deleted}')
@@ -0,0 +1,61 @@
+import math
+
+from django.conf import settings
+from django.http import JsonResponse
+
+from geolocation.resilience import TokenBucket
+
+
+def get_client_ip(request):
+    # only the addresses appended by our own proxies can be trusted,
+    # anything further left is sent by the client itself
+    proxies_count = settings.API_RATE_LIMIT_PROXIES
+    if proxies_count:
+        forwarded_for = [
+            address.strip() for address
+            in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',')
+            if address.strip()
+        ]
+        if len(forwarded_for) >= proxies_count:
+            return forwarded_for[-proxies_count]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def get_rate_limiter(path, client_ip):
+    # the longest matching prefix wins, nested endpoints share its bucket
+    prefix = max(
+        (prefix for prefix in settings.API_RATE_LIMITS
+         if path.startswith(prefix)),
+        key=len,
+        default=None,
+    )
+    if prefix is None:
+        return None
+    limit = settings.API_RATE_LIMITS[prefix]
+    return TokenBucket(
+        f'foodcartapp:ratelimit:{prefix}:{client_ip}',
+        rate=limit['rate'],
+        capacity=limit['burst'],
+    )
+
+
+class RateLimitMiddleware:
+    # sits in front of sessions and auth, so a rejected request never
+    # touches the database, and costs one cache read and one write
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        rate_limiter = get_rate_limiter(request.path_info,
+                                        get_client_ip(request))
+        if rate_limiter:
+            retry_after = rate_limiter.consume()
+            if retry_after:
+                response = JsonResponse(
+                    {'detail': 'Слишком много запросов, попробуйте позже.'},
+                    status=429,
+                    json_dumps_params={'ensure_ascii': False},
+                )
+                response['Retry-After'] = str(math.ceil(retry_after))
+                return response
+        return self.get_response(request)
@@ -0,0 +1,41 @@
+# Generated by Django 4.1 on 2026-10-18 18:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from geolocation.addresses import canonicalize_address
+
+
+def link_restaurant_locations(apps, schema_editor):
+    Restaurant = apps.get_model('foodcartapp', 'Restaurant')
+    Location = apps.get_model('geolocation', 'Location')
+    for restaurant in Restaurant.objects.only('id', 'address'):
+        location = (
+            Location.objects
+            .filter(address_key=canonicalize_address(restaurant.address))
+            .order_by('-updated_at')
+            .first()
+        )
+        if location:
+            Restaurant.objects.filter(pk=restaurant.id).update(
+                location=location
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geolocation', '0004_location_address_key'),
+        ('foodcartapp', '0053_alter_orderitem_product'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='restaurant',
+            name='location',
+            field=models.ForeignKey(blank=True, editable=False, help_text='заполняется автоматически по адресу', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='restaurants', to='geolocation.location', verbose_name='координаты'),
+        ),
+        migrations.RunPython(
+            link_restaurant_locations, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.1 on 2026-10-18 18:30
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0055_product_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogTombstone',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('product', 'товар'), ('category', 'категория'), ('menu_item', 'пункт меню')], max_length=10, verbose_name='что удалено')),
+                ('object_id', models.PositiveIntegerField(verbose_name='id удалённой записи')),
+                ('product_id', models.PositiveIntegerField(blank=True, null=True, verbose_name='id товара')),
+                ('restaurant_id', models.PositiveIntegerField(blank=True, null=True, verbose_name='id ресторана')),
+                ('deleted_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='удалена')),
+            ],
+            options={
+                'verbose_name': 'удалённая запись каталога',
+                'verbose_name_plural': 'удалённые записи каталога',
+            },
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now, verbose_name='изменён'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='productcategory',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now, verbose_name='изменена'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='restaurantmenuitem',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now, verbose_name='изменён'),
+            preserve_default=False,
+        ),
+    ]
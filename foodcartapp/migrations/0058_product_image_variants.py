@@ -0,0 +1,18 @@
+# Generated by Django 4.1 on 2026-10-18 18:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0057_menu_item_product_availability_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=list, editable=False, verbose_name='уменьшенные копии картинки'),
+        ),
+    ]
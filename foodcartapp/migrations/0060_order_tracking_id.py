@@ -0,0 +1,18 @@
+# Generated by Django 4.1 on 2026-10-18 18:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0059_orderidempotencykey'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='tracking_id',
+            field=models.CharField(blank=True, editable=False, max_length=32, null=True, unique=True, verbose_name='номер в очереди приёма'),
+        ),
+    ]
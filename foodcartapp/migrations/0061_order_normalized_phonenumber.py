@@ -0,0 +1,19 @@
+# Generated by Django 4.1 on 2026-10-18 18:15
+
+from django.db import migrations
+import foodcartapp.phones
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0060_order_tracking_id'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='phonenumber',
+            field=foodcartapp.phones.NormalizedPhoneNumberField(max_length=20, region=None, verbose_name='телефон'),
+        ),
+    ]
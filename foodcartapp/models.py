@@ -1,9 +1,10 @@
 from django.core.validators import MinValueValidator
 from django.db import models
-from django.db.models import F, Prefetch, Sum
+from django.db.models import Exists, F, OuterRef, Prefetch, Sum
 from django.db.models.query import QuerySet
 from django.utils import timezone
-from phonenumber_field.modelfields import PhoneNumberField
+
+from .phones import NormalizedPhoneNumberField
 
 
 class Restaurant(models.Model):
@@ -21,6 +22,16 @@ class Restaurant(models.Model):
         max_length=50,
         blank=True,
     )
+    location = models.ForeignKey(
+        'geolocation.Location',
+        on_delete=models.SET_NULL,
+        related_name='restaurants',
+        verbose_name='координаты',
+        help_text='заполняется автоматически по адресу',
+        null=True,
+        blank=True,
+        editable=False,
+    )
 
     class Meta:
         verbose_name = 'ресторан'
@@ -29,15 +40,23 @@ class Restaurant(models.Model):
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        restaurant = super().from_db(db, field_names, values)
+        restaurant._loaded_address = restaurant.__dict__.get('address')
+        return restaurant
+
+    def address_changed(self):
+        return getattr(self, '_loaded_address', None) != self.address
+
 
 class ProductQuerySet(models.QuerySet):
     def available(self):
-        products = (
-            RestaurantMenuItem.objects
-            .filter(availability=True)
-            .values_list('product')
+        available_menu_items = RestaurantMenuItem.objects.filter(
+            product=OuterRef('pk'),
+            availability=True,
         )
-        return self.filter(pk__in=products)
+        return self.filter(Exists(available_menu_items))
 
 
 class ProductCategory(models.Model):
@@ -45,6 +64,11 @@ class ProductCategory(models.Model):
         'название',
         max_length=50
     )
+    updated_at = models.DateTimeField(
+        'изменена',
+        auto_now=True,
+        db_index=True,
+    )
 
     class Meta:
         verbose_name = 'категория'
@@ -86,16 +110,40 @@ class Product(models.Model):
         max_length=200,
         blank=True,
     )
+    image_variants = models.JSONField(
+        'уменьшенные копии картинки',
+        default=list,
+        blank=True,
+        editable=False,
+    )
+    updated_at = models.DateTimeField(
+        'изменён',
+        auto_now=True,
+        db_index=True,
+    )
 
     objects = ProductQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'товар'
         verbose_name_plural = 'товары'
+        indexes = [
+            models.Index(fields=['category', 'id']),
+            models.Index(fields=['special_status', 'id']),
+        ]
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        product = super().from_db(db, field_names, values)
+        product._loaded_image = product.__dict__.get('image')
+        return product
+
+    def image_changed(self):
+        return getattr(self, '_loaded_image', None) != self.image.name
+
 
 class RestaurantMenuItem(models.Model):
     restaurant = models.ForeignKey(
@@ -109,12 +157,19 @@ class RestaurantMenuItem(models.Model):
         on_delete=models.CASCADE,
         related_name='menu_items',
         verbose_name='продукт',
+        # covered by the (product, availability) index
+        db_index=False,
     )
     availability = models.BooleanField(
         'в продаже',
         default=True,
         db_index=True
     )
+    updated_at = models.DateTimeField(
+        'изменён',
+        auto_now=True,
+        db_index=True,
+    )
 
     class Meta:
         verbose_name = 'пункт меню ресторана'
@@ -122,11 +177,54 @@ class RestaurantMenuItem(models.Model):
         unique_together = [
             ['restaurant', 'product']
         ]
+        indexes = [
+            models.Index(fields=['restaurant', 'availability', 'product']),
+            models.Index(fields=['product', 'availability']),
+        ]
 
     def __str__(self):
         return f"{self.restaurant.name} - {self.product.name}"
 
 
+class CatalogTombstone(models.Model):
+    PRODUCT = 'product'
+    CATEGORY = 'category'
+    MENU_ITEM = 'menu_item'
+    KIND_CHOICES = (
+        (PRODUCT, 'товар'),
+        (CATEGORY, 'категория'),
+        (MENU_ITEM, 'пункт меню'),
+    )
+    kind = models.CharField(
+        'что удалено',
+        max_length=10,
+        choices=KIND_CHOICES,
+    )
+    object_id = models.PositiveIntegerField('id удалённой записи')
+    product_id = models.PositiveIntegerField(
+        'id товара',
+        null=True,
+        blank=True,
+    )
+    restaurant_id = models.PositiveIntegerField(
+        'id ресторана',
+        null=True,
+        blank=True,
+    )
+    deleted_at = models.DateTimeField(
+        'удалена',
+        default=timezone.now,
+        db_index=True,
+    )
+
+    class Meta:
+        verbose_name = 'удалённая запись каталога'
+        verbose_name_plural = 'удалённые записи каталога'
+
+    def __str__(self):
+        return f'{self.get_kind_display()} {self.object_id}'
+
+
 class OrderQuerySet(QuerySet):
     def fetch_with_price(self):
         return self.prefetch_related(
@@ -162,7 +260,7 @@ class Order(models.Model):
         'адрес',
         max_length=200,
     )
-    phonenumber = PhoneNumberField(
+    phonenumber = NormalizedPhoneNumberField(
         'телефон',
         max_length=20
     )
@@ -210,6 +308,14 @@ class Order(models.Model):
         blank=True,
         null=True,
     )
+    tracking_id = models.CharField(
+        'номер в очереди приёма',
+        max_length=32,
+        unique=True,
+        null=True,
+        blank=True,
+        editable=False,
+    )
 
     objects = OrderQuerySet.as_manager()
 
@@ -253,3 +359,40 @@ class OrderItem(models.Model):
 
     def __str__(self):
         return self.product.name
+
+
+class OrderIdempotencyKey(models.Model):
+    key = models.CharField(
+        'ключ идемпотентности',
+        max_length=255,
+        unique=True,
+    )
+    request_hash = models.CharField(
+        'хэш запроса',
+        max_length=64,
+    )
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.CASCADE,
+        related_name='idempotency_keys',
+        verbose_name='заказ',
+        null=True,
+        blank=True,
+    )
+    response = models.JSONField(
+        'ответ',
+        null=True,
+        blank=True,
+    )
+    created_at = models.DateTimeField(
+        'получен',
+        default=timezone.now,
+        db_index=True,
+    )
+
+    class Meta:
+        verbose_name = 'ключ идемпотентности заказа'
+        verbose_name_plural = 'ключи идемпотентности заказов'
+
+    def __str__(self):
+        return self.key
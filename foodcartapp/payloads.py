@@ -0,0 +1,98 @@
+import gzip
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, JsonResponse
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+IDENTITY = 'identity'
+ENCODINGS = ['br', 'gzip'] if brotli else ['gzip']
+
+
+def render_payload(data):
+    body = json.dumps(
+        data, cls=DjangoJSONEncoder, ensure_ascii=False,
+        separators=(',', ':'),
+    ).encode('utf-8')
+    payload = {
+        IDENTITY: body,
+        'gzip': gzip.compress(body, compresslevel=9, mtime=0),
+    }
+    if brotli:
+        payload['br'] = brotli.compress(body, mode=brotli.MODE_TEXT)
+    return payload
+
+
+def parse_accept_encoding(header):
+    weights = {}
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        weight = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name.lower() == 'q':
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[coding] = weight
+    return weights
+
+
+def choose_encoding(request):
+    weights = parse_accept_encoding(
+        request.META.get('HTTP_ACCEPT_ENCODING', '')
+    )
+    default_weight = weights.get('*', 0.0)
+    candidates = [
+        encoding for encoding in ENCODINGS
+        if weights.get(encoding, default_weight) > 0
+    ]
+    if not candidates:
+        return IDENTITY
+    return max(
+        candidates,
+        key=lambda encoding: weights.get(encoding, default_weight),
+    )
+
+
+def is_pretty(request):
+    return 'pretty' in request.GET
+
+
+def get_payload_variant(request):
+    if is_pretty(request):
+        return 'pretty'
+    return choose_encoding(request)
+
+
+def json_response(request, data):
+    json_dumps_params = {'ensure_ascii': False, 'separators': (',', ':')}
+    if is_pretty(request):
+        json_dumps_params = {'ensure_ascii': False, 'indent': 4}
+    return JsonResponse(data, safe=False,
+                        json_dumps_params=json_dumps_params)
+
+
+def payload_response(request, payload):
+    if is_pretty(request):
+        # debugging only, so it is rendered on the fly and never compressed
+        data = json.loads(payload[IDENTITY])
+        response = HttpResponse(
+            json.dumps(data, ensure_ascii=False, indent=4),
+            content_type='application/json',
+        )
+    else:
+        encoding = choose_encoding(request)
+        response = HttpResponse(payload[encoding],
+                                content_type='application/json')
+        if encoding != IDENTITY:
+            response['Content-Encoding'] = encoding
+    return response
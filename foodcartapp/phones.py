@@ -0,0 +1,87 @@
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.utils.translation import gettext_lazy as _
+from phonenumber_field.modelfields import (PhoneNumberDescriptor,
+                                           PhoneNumberField)
+from phonenumber_field.phonenumber import PhoneNumber
+from phonenumber_field.validators import validate_international_phonenumber
+from phonenumbers import NumberParseException
+
+from geolocation.cache import LRUCache
+
+PHONE_REGION = 'RU'
+INVALID = (None, None)
+
+# parsed numbers are shared between model instances, so they are never
+# modified in place
+parsed_phonenumbers = LRUCache(maxsize=settings.PHONENUMBER_CACHE_SIZE,
+                               ttl=float('inf'))
+
+
+def parse_phonenumber(value):
+    # (PhoneNumber, E.164 string) or INVALID, each number is parsed once
+    # and is then found both by the original text and by its E.164 form
+    parsed = parsed_phonenumbers.get(value)
+    if parsed is not None:
+        return parsed
+    try:
+        phone_number = PhoneNumber.from_string(value, PHONE_REGION)
+    except NumberParseException:
+        phone_number = None
+    if phone_number is None or not phone_number.is_valid():
+        parsed = INVALID
+    else:
+        parsed = (phone_number, phone_number.as_e164)
+        parsed_phonenumbers.set(parsed[1], parsed)
+    parsed_phonenumbers.set(value, parsed)
+    return parsed
+
+
+def normalize_phonenumber(value):
+    # E.164 form of the number or None if it is not a valid one
+    _, normalized_value = parse_phonenumber(value)
+    return normalized_value
+
+
+def get_normalized_value(value):
+    if isinstance(value, str):
+        return normalize_phonenumber(value)
+    if isinstance(value, PhoneNumber) and isinstance(value.raw_input, str):
+        phone_number, normalized_value = parse_phonenumber(value.raw_input)
+        if phone_number is value:
+            return normalized_value
+    return None
+
+
+def validate_phonenumber(value):
+    if get_normalized_value(value):
+        return
+    if isinstance(value, str):
+        raise ValidationError(_('The phone number entered is not valid.'),
+                              code='invalid_phone_number')
+    validate_international_phonenumber(value)
+
+
+class NormalizedPhoneNumberDescriptor(PhoneNumberDescriptor):
+    def __set__(self, instance, value):
+        if isinstance(value, str):
+            phone_number = parse_phonenumber(value)[0]
+            if phone_number is not None:
+                instance.__dict__[self.field.name] = phone_number
+                return
+        super().__set__(instance, value)
+
+
+class NormalizedPhoneNumberField(PhoneNumberField):
+    # numbers are parsed once per process, whether they come from the API,
+    # from the database or are saved back to it
+    descriptor_class = NormalizedPhoneNumberDescriptor
+    default_validators = [validate_phonenumber]
+
+    def get_prep_value(self, value):
+        db_format = getattr(settings, 'PHONENUMBER_DB_FORMAT', 'E164')
+        if value and db_format == 'E164':
+            normalized_value = get_normalized_value(value)
+            if normalized_value:
+                return normalized_value
+        return super().get_prep_value(value)
@@ -0,0 +1,18 @@
+from geolocation.spatial import get_spatial_index
+
+from .models import Restaurant
+
+RESTAURANT_INDEX = 'restaurants'
+
+
+def fill_restaurant_index(index):
+    restaurant_points = Restaurant.objects.filter(
+        location__lat__isnull=False,
+        location__lon__isnull=False,
+    ).values_list('id', 'location__lat', 'location__lon')
+    for restaurant_id, lat, lon in restaurant_points:
+        index.add(restaurant_id, lat, lon)
+
+
+def get_restaurant_index():
+    return get_spatial_index(RESTAURANT_INDEX, fill_restaurant_index)
@@ -0,0 +1,56 @@
+from rest_framework.serializers import (IntegerField, ModelSerializer,
+                                        ValidationError)
+
+from .models import Order, OrderItem, Product
+from .phones import normalize_phonenumber
+
+
+class OrderItemSerializer(ModelSerializer):
+    # resolved for the whole cart at once in OrderSerializer
+    product = IntegerField(min_value=1)
+
+    class Meta:
+        model = OrderItem
+        fields = ['product', 'quantity']
+
+
+class OrderSerializer(ModelSerializer):
+    products = OrderItemSerializer(many=True,
+                                   allow_null=False,
+                                   write_only=True)
+
+    class Meta:
+        model = Order
+        fields = ['products',
+                  'id',
+                  'firstname',
+                  'lastname',
+                  'phonenumber',
+                  'address']
+
+    def validate_products(self, value):
+        if not value:
+            raise ValidationError('Этот список не может быть пустым.')
+
+        product_ids = {fields['product'] for fields in value}
+        # bulk imports share already loaded products between records
+        products = self.context.get('products', {})
+        missing_ids = product_ids - products.keys()
+        if missing_ids:
+            products.update(Product.objects.in_bulk(missing_ids))
+        unknown_ids = product_ids - products.keys()
+        if unknown_ids:
+            raise ValidationError(
+                'Товары не найдены: '
+                f'{", ".join(map(str, sorted(unknown_ids)))}.'
+            )
+        return [
+            {**fields, 'product': products[fields['product']]}
+            for fields in value
+        ]
+
+    def validate_phonenumber(self, value):
+        phone_number = normalize_phonenumber(value)
+        if not phone_number:
+            raise ValidationError('Введен некорректный номер телефона.')
+        return phone_number
@@ -0,0 +1,113 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from geolocation.spatial import invalidate_spatial_indexes
+
+from .availability import (add_restaurant_availability,
+                           refresh_product_availability,
+                           remove_restaurant_availability)
+from .models import (CatalogTombstone, Product, ProductCategory, Restaurant,
+                     RestaurantMenuItem)
+from .tasks import (schedule_catalog_publishing, schedule_geocode_restaurant,
+                    schedule_image_variants)
+
+
+@receiver(post_save, sender=RestaurantMenuItem)
+@receiver(post_delete, sender=RestaurantMenuItem)
+def update_product_availability(sender, instance, **kwargs):
+    transaction.on_commit(
+        lambda: refresh_product_availability(instance.product_id)
+    )
+
+
+@receiver(post_save, sender=Restaurant)
+def add_restaurant_slot(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(
+            lambda: add_restaurant_availability(instance.id)
+        )
+
+
+@receiver(post_save, sender=Restaurant)
+@receiver(post_delete, sender=Restaurant)
+def update_restaurant_index(sender, **kwargs):
+    transaction.on_commit(invalidate_spatial_indexes)
+
+
+@receiver(post_save, sender=Restaurant)
+def schedule_restaurant_geocoding(sender, instance, created, **kwargs):
+    if created or instance.address_changed():
+        if instance.address.strip():
+            schedule_geocode_restaurant(instance.id)
+        elif instance.location_id:
+            # update() does not send post_save again
+            Restaurant.objects.filter(pk=instance.id).update(location=None)
+            instance.location = None
+    instance._loaded_address = instance.address
+
+
+@receiver(post_delete, sender=Restaurant)
+def remove_restaurant_slot(sender, instance, **kwargs):
+    restaurant_id = instance.id
+    transaction.on_commit(
+        lambda: remove_restaurant_availability(restaurant_id)
+    )
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductCategory)
+@receiver(post_delete, sender=ProductCategory)
+@receiver(post_save, sender=RestaurantMenuItem)
+@receiver(post_delete, sender=RestaurantMenuItem)
+def update_catalog_version(sender, **kwargs):
+    transaction.on_commit(schedule_catalog_publishing)
+
+
+@receiver(post_save, sender=Product)
+def schedule_product_image_variants(sender, instance, created, **kwargs):
+    if created or instance.image_changed():
+        product_id = instance.id
+        if instance.image_variants:
+            # variants of the previous image must not outlive it
+            instance.image_variants = []
+            Product.objects.filter(pk=product_id).update(image_variants=[])
+        transaction.on_commit(lambda: schedule_image_variants(product_id))
+    instance._loaded_image = instance.image.name
+
+
+@receiver(post_delete, sender=Product)
+def bury_product(sender, instance, **kwargs):
+    CatalogTombstone.objects.create(
+        kind=CatalogTombstone.PRODUCT,
+        object_id=instance.id,
+    )
+
+
+@receiver(pre_delete, sender=ProductCategory)
+def touch_category_products(sender, instance, **kwargs):
+    # the products lose their category by a plain UPDATE before post_delete,
+    # which does not change updated_at, so the change feed would miss them
+    Product.objects.filter(category=instance).update(
+        updated_at=timezone.now()
+    )
+
+
+@receiver(post_delete, sender=ProductCategory)
+def bury_category(sender, instance, **kwargs):
+    CatalogTombstone.objects.create(
+        kind=CatalogTombstone.CATEGORY,
+        object_id=instance.id,
+    )
+
+
+@receiver(post_delete, sender=RestaurantMenuItem)
+def bury_menu_item(sender, instance, **kwargs):
+    CatalogTombstone.objects.create(
+        kind=CatalogTombstone.MENU_ITEM,
+        object_id=instance.id,
+        product_id=instance.product_id,
+        restaurant_id=instance.restaurant_id,
+    )
@@ -0,0 +1,63 @@
+from geolocation.models import Location
+from geolocation.spatial import invalidate_spatial_indexes
+from geolocation.tasks import geocode_addresses
+from jobs.queue import enqueue, task
+
+from .catalog import bump_catalog_version, publish_catalog
+from .images import update_product_image_variants
+from .models import Order, Product, Restaurant
+
+
+@task('foodcartapp.geocode_order')
+def geocode_order(order_id):
+    order = Order.objects.filter(pk=order_id).only('address').first()
+    if order:
+        geocode_addresses([order.address])
+
+
+@task('foodcartapp.geocode_restaurant')
+def geocode_restaurant(restaurant_id):
+    restaurant = Restaurant.objects.filter(pk=restaurant_id).first()
+    if not restaurant:
+        return
+    geocode_addresses([restaurant.address])
+    location = Location.objects.in_bulk_by_address(
+        [restaurant.address]
+    ).get(restaurant.address)
+    Restaurant.objects.filter(pk=restaurant.id).update(location=location)
+    invalidate_spatial_indexes()
+
+
+def schedule_geocode_restaurant(restaurant_id):
+    return enqueue(
+        'foodcartapp.geocode_restaurant',
+        {'restaurant_id': restaurant_id},
+        key=f'foodcartapp.geocode_restaurant:{restaurant_id}',
+    )
+
+
+@task('foodcartapp.publish_catalog')
+def publish_current_catalog():
+    publish_catalog()
+
+
+def schedule_catalog_publishing():
+    bump_catalog_version()
+    # requests publish the catalog themselves if the job is late
+    return enqueue('foodcartapp.publish_catalog',
+                   key='foodcartapp.publish_catalog')
+
+
+@task('foodcartapp.generate_image_variants')
+def generate_image_variants(product_id):
+    product = Product.objects.filter(pk=product_id).first()
+    if product and update_product_image_variants(product):
+        schedule_catalog_publishing()
+
+
+def schedule_image_variants(product_id):
+    return enqueue(
+        'foodcartapp.generate_image_variants',
+        {'product_id': product_id},
+        key=f'foodcartapp.generate_image_variants:{product_id}',
+    )
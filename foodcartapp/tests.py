@@ -0,0 +1,1003 @@
+import gzip
+import json
+import os
+import tempfile
+import threading
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import skipUnless
+from unittest.mock import patch
+
+import phonenumbers
+from django.contrib.auth.models import Permission, User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+
+from jobs.models import Job
+
+from . import payloads
+from .availability import (AVAILABILITY_CACHE_KEY, RestaurantAvailability,
+                           add_restaurant_availability,
+                           get_restaurant_availability,
+                           rebuild_restaurant_availability,
+                           refresh_product_availability)
+from .benchmarks import seed_catalog
+from .catalog import get_changes_token
+from .images import (generate_image_variants, get_srcset, get_variant_url,
+                     update_product_image_variants)
+from .intake import drain_spool, get_spool_dir, lock_spool
+from .models import (Order, OrderItem, Product, ProductCategory, Restaurant,
+                     RestaurantMenuItem)
+from .phones import normalize_phonenumber, parsed_phonenumbers
+
+Image.init()
+WEBP_SUPPORTED = 'WEBP' in Image.SAVE
+
+
+class AvailableProductsPlanTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = seed_catalog(products_count=1000, restaurants_count=100)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def assertNoMenuItemScan(self, queryset):
+        plan = queryset.explain()
+        table = RestaurantMenuItem._meta.db_table
+        if connection.vendor == 'postgresql':
+            self.assertNotIn(f'Seq Scan on {table}', plan)
+        else:
+            self.assertNotRegex(plan, rf'SCAN {table}\b|SCAN U\d+\b')
+        self.assertIn('_idx', plan)
+
+    def test_seeded_menu_items(self):
+        self.assertEqual(RestaurantMenuItem.objects.count(), 100000)
+
+    def test_available_uses_index(self):
+        self.assertNoMenuItemScan(Product.objects.available())
+
+    def test_filtered_available_uses_index(self):
+        self.assertNoMenuItemScan(
+            Product.objects.available().filter(category=self.category)
+        )
+
+    def test_available_matches_menu(self):
+        available_ids = set(
+            RestaurantMenuItem.objects
+            .filter(availability=True)
+            .values_list('product_id', flat=True)
+        )
+        self.assertEqual(
+            set(Product.objects.available().values_list('id', flat=True)),
+            available_ids,
+        )
+
+
+class RestaurantAvailabilityTest(SimpleTestCase):
+    def setUp(self):
+        self.availability = RestaurantAvailability([10, 20, 30], {})
+        for product_id, restaurant_id in [(1, 10), (1, 20), (1, 30),
+                                          (2, 20), (2, 30), (3, 20)]:
+            self.availability.set_available(product_id, restaurant_id)
+
+    def test_restaurants_have_all_products(self):
+        self.assertEqual(self.availability.restaurants_for([1, 2]), {20, 30})
+        self.assertEqual(self.availability.restaurants_for([1, 2, 3]), {20})
+        self.assertEqual(self.availability.restaurants_for([1, 4]), set())
+        self.assertEqual(self.availability.restaurants_for([]), set())
+
+    def test_unknown_restaurant_is_ignored(self):
+        self.availability.set_available(4, 40)
+
+        self.assertEqual(self.availability.restaurants_for([4]), set())
+
+    def test_update_product_replaces_restaurants(self):
+        self.availability.update_product(2, [10])
+
+        self.assertEqual(self.availability.restaurants_for([2]), {10})
+        self.assertEqual(self.availability.restaurants_for([1]), {10, 20, 30})
+
+        self.availability.update_product(2, [])
+
+        self.assertNotIn(2, self.availability.product_masks)
+
+    def test_removed_restaurant_slot_is_reused(self):
+        self.availability.remove_restaurant(20)
+
+        self.assertEqual(self.availability.restaurants_for([1]), {10, 30})
+        self.assertNotIn(3, self.availability.product_masks)
+
+        self.availability.add_restaurant(40)
+
+        self.assertEqual(self.availability.restaurant_ids, [10, 40, 30])
+        self.assertEqual(self.availability.restaurants_for([1]), {10, 30})
+        self.availability.set_available(1, 40)
+        self.assertEqual(self.availability.restaurants_for([1]),
+                         {10, 30, 40})
+
+    def test_new_restaurant_gets_new_slot(self):
+        self.availability.add_restaurant(40)
+        self.availability.add_restaurant(40)
+        self.availability.set_available(2, 40)
+
+        self.assertEqual(self.availability.restaurant_ids, [10, 20, 30, 40])
+        self.assertEqual(self.availability.restaurants_for([2]), {20, 30, 40})
+
+
+class MatchOrdersTest(TestCase):
+    def setUp(self):
+        self.tverskaya = Restaurant.objects.create(name='Тверская')
+        self.arbat = Restaurant.objects.create(name='Арбат')
+        self.burger = Product.objects.create(name='Бургер', price=100)
+        self.cola = Product.objects.create(name='Кола', price=50)
+        self.juice = Product.objects.create(name='Сок', price=70)
+        for restaurant, product, availability in [
+            (self.tverskaya, self.burger, True),
+            (self.tverskaya, self.cola, True),
+            (self.arbat, self.burger, True),
+            (self.arbat, self.cola, False),
+            (self.arbat, self.juice, True),
+        ]:
+            RestaurantMenuItem.objects.create(
+                restaurant=restaurant, product=product,
+                availability=availability,
+            )
+
+    def create_order(self, *products):
+        order = Order.objects.create(
+            firstname='Иван', lastname='Петров', address='Москва',
+            phonenumber='+79291000000',
+        )
+        for product in products:
+            OrderItem.objects.create(order=order, product=product,
+                                     quantity=1, price=product.price)
+        return order
+
+    def test_restaurants_can_cook_whole_order(self):
+        burger_order = self.create_order(self.burger)
+        cola_order = self.create_order(self.burger, self.cola)
+        impossible_order = self.create_order(self.cola, self.juice)
+        orders = Order.objects.prefetch_related('items')
+
+        availability = RestaurantAvailability.build()
+        with self.assertNumQueries(2):
+            matches = availability.match_orders(orders)
+
+        self.assertEqual(matches, {
+            burger_order.id: {self.tverskaya.id, self.arbat.id},
+            cola_order.id: {self.tverskaya.id},
+            impossible_order.id: set(),
+        })
+
+
+class RestaurantAvailabilityVersionTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        seed_catalog(products_count=1, restaurants_count=1,
+                     available_share=1)
+        self.product = Product.objects.get()
+
+    def test_local_copy_is_stale_after_cache_flush(self):
+        self.assertTrue(
+            get_restaurant_availability().restaurants_for([self.product.id])
+        )
+        cache.clear()
+        RestaurantMenuItem.objects.update(availability=False)
+        # another process rebuilds the shared copy first
+        rebuild_restaurant_availability()
+
+        self.assertFalse(
+            get_restaurant_availability().restaurants_for([self.product.id])
+        )
+
+    def make_product_unavailable(self, *args):
+        # another process changes the menu while the copy is updated
+        RestaurantMenuItem.objects.update(availability=False)
+        refresh_product_availability(self.product.id)
+
+    def test_change_made_during_update_is_kept(self):
+        get_restaurant_availability()
+
+        with patch('foodcartapp.availability.RestaurantAvailability'
+                   '.add_restaurant', side_effect=self.make_product_unavailable):
+            add_restaurant_availability(-2)
+
+        self.assertFalse(
+            get_restaurant_availability().restaurants_for([self.product.id])
+        )
+
+    def test_change_made_after_version_check_is_kept(self):
+        get_restaurant_availability()
+        set_cache = cache.set
+
+        def make_product_unavailable_and_set(key, *args, **kwargs):
+            if key == AVAILABILITY_CACHE_KEY:
+                self.make_product_unavailable()
+            set_cache(key, *args, **kwargs)
+
+        with patch.object(cache, 'set',
+                          side_effect=make_product_unavailable_and_set):
+            add_restaurant_availability(-1)
+
+        self.assertFalse(
+            get_restaurant_availability().restaurants_for([self.product.id])
+        )
+
+
+class RestaurantGeocodingSignalTest(TestCase):
+    def test_blank_address_is_not_geocoded(self):
+        Restaurant.objects.create(name='Без адреса', address=' ')
+
+        self.assertFalse(Job.objects.exists())
+
+    def test_changed_address_is_geocoded(self):
+        restaurant = Restaurant.objects.create(name='Тверская', address='')
+        restaurant = Restaurant.objects.get(pk=restaurant.pk)
+        restaurant.address = 'Москва, Тверская 1'
+        restaurant.save()
+
+        self.assertEqual(
+            Job.objects.get().payload, {'restaurant_id': restaurant.id}
+        )
+
+
+class CatalogTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.burgers = ProductCategory.objects.create(name='Бургеры')
+        self.drinks = ProductCategory.objects.create(name='Напитки')
+        self.tverskaya = Restaurant.objects.create(name='Тверская')
+        self.arbat = Restaurant.objects.create(name='Арбат')
+        self.products = {}
+        for name, category, special_status, restaurant, availability in [
+            ('Чизбургер', self.burgers, True, self.tverskaya, True),
+            ('Кола', self.drinks, False, self.tverskaya, True),
+            ('Гамбургер', self.burgers, False, self.arbat, True),
+            ('Морс', self.drinks, False, self.arbat, False),
+        ]:
+            product = Product.objects.create(
+                name=name, category=category, price=100,
+                special_status=special_status, image='burger.jpg',
+            )
+            RestaurantMenuItem.objects.create(
+                restaurant=restaurant, product=product,
+                availability=availability,
+            )
+            self.products[name] = product
+
+    def get_products(self, **params):
+        headers = {
+            f'HTTP_{name.upper().replace("-", "_")}': value
+            for name, value in params.pop('headers', {}).items()
+        }
+        return self.client.get('/api/products/', params, **headers)
+
+
+class CatalogConditionalRequestTest(CatalogTestCase):
+    def test_matching_etag_gets_not_modified_without_queries(self):
+        etag = self.get_products()['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.get_products(headers={'If-None-Match': etag})
+
+        self.assertEqual(response.status_code, 304)
+
+    def test_catalog_change_changes_etag(self):
+        etag = self.get_products()['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            product = self.products['Кола']
+            product.price = 120
+            product.save()
+        response = self.get_products(headers={'If-None-Match': etag})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIn('120', response.content.decode())
+
+
+class CatalogEncodingTest(CatalogTestCase):
+    def get_product_names(self, content):
+        return {product['name'] for product in json.loads(content)}
+
+    def test_gzip_is_chosen_from_accept_encoding(self):
+        response = self.get_products(headers={'Accept-Encoding': 'gzip'})
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(
+            self.get_product_names(gzip.decompress(response.content)),
+            {'Чизбургер', 'Кола', 'Гамбургер'},
+        )
+
+    @skipUnless(payloads.brotli, 'Brotli не установлен')
+    def test_brotli_is_preferred(self):
+        response = self.get_products(
+            headers={'Accept-Encoding': 'gzip, deflate, br'}
+        )
+
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(
+            self.get_product_names(payloads.brotli.decompress(
+                response.content
+            )),
+            {'Чизбургер', 'Кола', 'Гамбургер'},
+        )
+
+    def test_refused_encoding_is_not_used(self):
+        response = self.get_products(
+            headers={'Accept-Encoding': 'gzip;q=0, br;q=0'}
+        )
+
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(len(self.get_product_names(response.content)), 3)
+
+    def test_each_encoding_has_own_etag(self):
+        gzip_response = self.get_products(headers={'Accept-Encoding': 'gzip'})
+        identity_response = self.get_products()
+
+        self.assertNotEqual(gzip_response['ETag'], identity_response['ETag'])
+
+
+class CatalogFiltersTest(CatalogTestCase):
+    def get_names(self, response):
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        if isinstance(data, dict):
+            data = data['results']
+        return [product['name'] for product in data]
+
+    def test_filters(self):
+        cases = [
+            ({'category': self.burgers.id}, ['Чизбургер', 'Гамбургер']),
+            ({'restaurant': self.tverskaya.id}, ['Чизбургер', 'Кола']),
+            ({'restaurant': self.arbat.id}, ['Гамбургер']),
+            ({'special_status': 'true'}, ['Чизбургер']),
+            ({'special_status': 'false'}, ['Кола', 'Гамбургер']),
+            (
+                {'ids': f'{self.products["Кола"].id},'
+                        f'{self.products["Морс"].id}'},
+                ['Кола'],
+            ),
+        ]
+        for params, names in cases:
+            with self.subTest(params=params):
+                self.assertEqual(
+                    self.get_names(self.get_products(**params)), names
+                )
+
+    def test_fields(self):
+        response = self.get_products(fields='id,name')
+
+        self.assertEqual(response.json()[0], {
+            'id': self.products['Чизбургер'].id,
+            'name': 'Чизбургер',
+        })
+
+    def test_next_cursor(self):
+        first_page = self.get_products(limit=2).json()
+
+        self.assertEqual(
+            [product['name'] for product in first_page['results']],
+            ['Чизбургер', 'Кола'],
+        )
+        second_page = self.client.get(first_page['next']).json()
+        self.assertEqual(
+            [product['name'] for product in second_page['results']],
+            ['Гамбургер'],
+        )
+        self.assertIsNone(second_page['next'])
+
+    @override_settings(PRODUCTS_PAGE_SIZE=1, PRODUCTS_PAGE_SIZE_MAX=2)
+    def test_page_size_settings(self):
+        self.assertEqual(len(self.get_products(cursor=0).json()['results']), 1)
+        self.assertEqual(
+            len(self.get_products(limit=100).json()['results']), 2
+        )
+
+    def test_validation_errors(self):
+        for params, field in [
+            ({'category': 'burgers'}, 'category'),
+            ({'ids': '1,x'}, 'ids'),
+            ({'fields': 'id,weight'}, 'fields'),
+            ({'limit': 0}, 'limit'),
+            ({'cursor': -1}, 'cursor'),
+        ]:
+            with self.subTest(params=params), \
+                    self.assertLogs('django.request', 'WARNING'):
+                response = self.get_products(**params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(field, response.json())
+
+
+@override_settings(CATALOG_CHANGES_OVERLAP=0)
+class CatalogChangesTest(CatalogTestCase):
+    def get_changes(self, since=None):
+        params = {'since': since} if since else {}
+        response = self.client.get('/api/products/changes/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_full_sync_then_no_changes(self):
+        changes = self.get_changes()
+
+        self.assertEqual(
+            [product['name'] for product in changes['products']],
+            ['Чизбургер', 'Кола', 'Гамбургер'],
+        )
+        self.assertEqual(len(changes['categories']), 2)
+        next_changes = self.get_changes(changes['token'])
+        self.assertEqual(next_changes['products'], [])
+        self.assertEqual(next_changes['availability'], [])
+
+    def test_changed_product(self):
+        token = self.get_changes()['token']
+        product = self.products['Кола']
+        product.price = 120
+        product.save()
+
+        changes = self.get_changes(token)
+
+        self.assertEqual(
+            [product['name'] for product in changes['products']], ['Кола']
+        )
+        self.assertEqual(changes['removed_products'], [])
+
+    def test_deleted_product(self):
+        token = self.get_changes()['token']
+        product_id = self.products['Гамбургер'].id
+        self.products['Гамбургер'].delete()
+
+        changes = self.get_changes(token)
+
+        self.assertEqual(changes['removed_products'], [product_id])
+
+    def test_deleted_category(self):
+        token = self.get_changes()['token']
+        category_id = self.drinks.id
+        self.drinks.delete()
+
+        changes = self.get_changes(token)
+
+        self.assertEqual(changes['removed_categories'], [category_id])
+        self.assertEqual(
+            [(product['name'], product['category'])
+             for product in changes['products']],
+            [('Кола', None)],
+        )
+
+    def test_deleted_menu_item(self):
+        token = self.get_changes()['token']
+        product_id = self.products['Кола'].id
+        RestaurantMenuItem.objects.get(product_id=product_id).delete()
+
+        changes = self.get_changes(token)
+
+        self.assertEqual(changes['availability'], [{
+            'restaurant': self.tverskaya.id,
+            'product': product_id,
+            'availability': False,
+        }])
+        self.assertEqual(changes['removed_products'], [product_id])
+
+    @override_settings(CATALOG_TOMBSTONE_TTL=60)
+    def test_expired_token(self):
+        token = get_changes_token(timezone.now() - timedelta(minutes=2))
+
+        with self.assertLogs('django.request', 'WARNING'):
+            response = self.client.get('/api/products/changes/',
+                                       {'since': token})
+
+        self.assertEqual(response.status_code, 410)
+
+    def test_malformed_token(self):
+        for token in ['yesterday', '9' * 24, '9' * 400]:
+            with self.subTest(token=token), \
+                    self.assertLogs('django.request', 'WARNING'):
+                response = self.client.get('/api/products/changes/',
+                                           {'since': token})
+                self.assertEqual(response.status_code, 400)
+
+
+class RegisterOrderQueriesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = seed_catalog(products_count=20, restaurants_count=1)
+        cls.product_ids = list(
+            Product.objects
+            .filter(category=category)
+            .values_list('id', flat=True)
+        )
+
+    def register_order(self, product_ids):
+        return self.client.post('/api/order/', {
+            'products': [
+                {'product': product_id, 'quantity': 2}
+                for product_id in product_ids
+            ],
+            'firstname': 'Иван',
+            'lastname': 'Петров',
+            'phonenumber': '+79291000000',
+            'address': 'Москва, Тверская 1',
+        }, content_type='application/json')
+
+    def test_query_count_does_not_depend_on_cart_size(self):
+        with CaptureQueriesContext(connection) as small_cart:
+            response = self.register_order(self.product_ids[:1])
+        self.assertEqual(response.status_code, 200)
+
+        with CaptureQueriesContext(connection) as large_cart:
+            response = self.register_order(self.product_ids)
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(len(large_cart), len(small_cart))
+        self.assertEqual(
+            OrderItem.objects.filter(order_id=response.json()['id']).count(),
+            len(self.product_ids),
+        )
+
+    def test_unknown_products_are_reported_together(self):
+        response = self.register_order([self.product_ids[0], 999998, 999999])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {
+            'products': ['Товары не найдены: 999998, 999999.'],
+        })
+
+
+class IdempotentOrderTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed_catalog(products_count=1, restaurants_count=1)
+        cls.product = Product.objects.get()
+
+    def setUp(self):
+        cache.clear()
+
+    def register_order(self, key, quantity=1):
+        return self.client.post('/api/order/', {
+            'products': [{'product': self.product.id, 'quantity': quantity}],
+            'firstname': 'Иван',
+            'lastname': 'Петров',
+            'phonenumber': '+79291000000',
+            'address': 'Москва, Тверская 1',
+        }, content_type='application/json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_repeated_key_returns_original_order(self):
+        first_response = self.register_order('cart-1')
+        cache.clear()
+        with self.assertNumQueries(1):
+            repeated_response = self.register_order('cart-1')
+        with self.assertNumQueries(0):
+            self.register_order('cart-1')
+
+        self.assertEqual(repeated_response.status_code, 200)
+        self.assertEqual(repeated_response.json(), first_response.json())
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_key_reused_for_other_cart(self):
+        self.register_order('cart-1')
+        response = self.register_order('cart-1', quantity=2)
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Order.objects.count(), 1)
+
+
+class BufferedOrderIntakeTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed_catalog(products_count=1, restaurants_count=1)
+        cls.product = Product.objects.get()
+
+    def setUp(self):
+        spool_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(spool_dir.cleanup)
+        buffered_intake = override_settings(
+            ORDER_INTAKE_MODE='buffered',
+            ORDER_INTAKE_SPOOL_DIR=spool_dir.name,
+        )
+        buffered_intake.enable()
+        self.addCleanup(buffered_intake.disable)
+
+    def test_queued_order_is_created_by_drain(self):
+        response = self.client.post('/api/order/', {
+            'products': [{'product': self.product.id, 'quantity': 3}],
+            'firstname': 'Иван',
+            'lastname': 'Петров',
+            'phonenumber': '+79291000000',
+            'address': 'Москва, Тверская 1',
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 202)
+        self.assertFalse(Order.objects.exists())
+        status_url = f'/api/order/status/{response.json()["tracking_id"]}/'
+        self.assertEqual(self.client.get(status_url).json()['status'],
+                         'queued')
+
+        self.assertEqual(drain_spool(), 1)
+
+        order = Order.objects.get()
+        self.assertEqual(order.items.get().quantity, 3)
+        self.assertEqual(self.client.get(status_url).json(), {
+            'tracking_id': order.tracking_id,
+            'status': 'created',
+            'id': order.id,
+        })
+
+    def post_order(self, product_id):
+        response = self.client.post('/api/order/', {
+            'products': [{'product': product_id, 'quantity': 1}],
+            'firstname': 'Иван',
+            'lastname': 'Петров',
+            'phonenumber': '+79291000000',
+            'address': 'Москва, Тверская 1',
+        }, content_type='application/json')
+        return response.json()['tracking_id']
+
+    def get_status(self, tracking_id):
+        return self.client.get(f'/api/order/status/{tracking_id}/')
+
+    def test_status_is_found_without_listing_spool(self):
+        first_id = self.post_order(self.product.id)
+        second_id = self.post_order(self.product.id)
+
+        self.assertLess(first_id, second_id)
+        with patch('foodcartapp.intake.os.listdir') as listdir, \
+                self.assertNumQueries(0):
+            self.assertEqual(self.get_status(second_id).json()['status'],
+                             'queued')
+        listdir.assert_not_called()
+
+    def test_failed_and_unknown_orders(self):
+        tracking_id = self.post_order(self.product.id)
+        Product.objects.filter(pk=self.product.pk).delete()
+
+        with self.assertLogs('foodcartapp.intake', 'WARNING'):
+            drain_spool()
+
+        self.assertEqual(self.get_status(tracking_id).json()['status'],
+                         'failed')
+        self.assertFalse(Order.objects.exists())
+        with self.assertLogs('django.request', 'WARNING'):
+            self.assertEqual(self.get_status('0' * 32).status_code, 404)
+            self.assertEqual(self.get_status('unknown').status_code, 404)
+
+    def test_drainers_take_turns(self):
+        self.post_order(self.product.id)
+        drained = []
+
+        drainer = threading.Thread(target=lambda: drained.append(
+            drain_spool()
+        ))
+        with patch('foodcartapp.intake.drain_locked_spool', return_value=1):
+            with lock_spool():
+                drainer.start()
+                drainer.join(0.2)
+                self.assertTrue(drainer.is_alive())
+            drainer.join(5)
+
+        self.assertEqual(drained, [1])
+        self.assertTrue(os.path.exists(get_spool_dir('.lock')))
+
+
+class ImportOrdersTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed_catalog(products_count=2, restaurants_count=1)
+        cls.product_ids = list(Product.objects.values_list('id', flat=True))
+        cls.user = User.objects.create_user('partner')
+        cls.user.user_permissions.add(
+            Permission.objects.get(codename='add_order')
+        )
+
+    def get_lines(self):
+        order = {
+            'products': [
+                {'product': product_id, 'quantity': 1}
+                for product_id in self.product_ids
+            ],
+            'firstname': 'Иван',
+            'lastname': 'Петров',
+            'phonenumber': '+79291000000',
+            'address': 'Москва, Тверская 1',
+        }
+        return '\n'.join([
+            json.dumps(order),
+            json.dumps({**order, 'phonenumber': '123'}),
+            '{broken',
+            json.dumps(order),
+        ])
+
+    def test_endpoint_streams_report(self):
+        self.client.force_login(self.user)
+        response = self.client.post('/api/order/import/', self.get_lines(),
+                                    content_type='application/x-ndjson')
+
+        self.assertEqual(response.status_code, 200)
+        report = [
+            json.loads(line)
+            for line in b''.join(response.streaming_content).splitlines()
+        ]
+        self.assertEqual([row['line'] for row in report], [2, 3, 1, 4])
+        self.assertIn('phonenumber', report[0]['errors'])
+        self.assertEqual(
+            {row['id'] for row in report if 'id' in row},
+            set(Order.objects.values_list('id', flat=True)),
+        )
+        self.assertEqual(OrderItem.objects.count(), 4)
+
+    def test_endpoint_requires_permission(self):
+        response = self.client.post('/api/order/import/', self.get_lines(),
+                                    content_type='application/x-ndjson')
+        self.assertIn(response.status_code, [401, 403])
+        self.assertFalse(Order.objects.exists())
+
+    def test_command_writes_chunks(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl') as source:
+            source.write(self.get_lines())
+            source.flush()
+            report = StringIO()
+            call_command('import_orders', source.name, chunk_size=1,
+                         stdout=report, stderr=StringIO())
+
+        self.assertEqual(len(report.getvalue().splitlines()), 4)
+        self.assertEqual(Order.objects.count(), 2)
+
+
+@override_settings(
+    API_RATE_LIMITS={
+        '/api/products/': {'rate': 0.1, 'burst': 2},
+        '/api/order/': {'rate': 0.1, 'burst': 1},
+        '/api/order/status/': {'rate': 0.1, 'burst': 3},
+    },
+    API_RATE_LIMIT_PROXIES=1,
+)
+class RateLimitTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def get_products(self, client_ip):
+        return self.client.get('/api/products/',
+                               HTTP_X_FORWARDED_FOR=f'10.0.0.1, {client_ip}')
+
+    def test_rejects_over_limit_without_queries(self):
+        self.get_products('192.0.2.1')
+        self.get_products('192.0.2.1')
+        with self.assertNumQueries(0):
+            response = self.get_products('192.0.2.1')
+
+        self.assertEqual(response.status_code, 429)
+        self.assertIn(response['Retry-After'], ('9', '10'))
+        self.assertEqual(self.get_products('192.0.2.2').status_code, 200)
+
+    def test_nested_endpoints_share_prefix_bucket(self):
+        self.get_products('192.0.2.1')
+        self.get_products('192.0.2.1')
+
+        response = self.client.get('/api/products/changes/',
+                                   HTTP_X_FORWARDED_FOR='192.0.2.1')
+
+        self.assertEqual(response.status_code, 429)
+
+    @override_settings(API_RATE_LIMIT_PROXIES=0)
+    def test_forwarded_for_is_ignored_without_proxies(self):
+        self.get_products('192.0.2.1')
+        self.get_products('192.0.2.2')
+
+        self.assertEqual(self.get_products('192.0.2.3').status_code, 429)
+
+    def test_longest_prefix_wins(self):
+        for _ in range(3):
+            response = self.client.get('/api/order/status/unknown/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_other_endpoints_are_not_limited(self):
+        for _ in range(3):
+            response = self.client.get('/api/banners/')
+        self.assertEqual(response.status_code, 200)
+
+
+class NormalizePhonenumberTest(SimpleTestCase):
+    def test_formats_are_normalized_to_e164(self):
+        for value in ['+7 929 100-00-00', '89291000000', '+79291000000']:
+            self.assertEqual(normalize_phonenumber(value), '+79291000000')
+
+    def test_invalid_numbers(self):
+        for value in ['123', 'not a phone', '+7 000 000-00-00']:
+            self.assertIsNone(normalize_phonenumber(value))
+
+    def test_each_number_is_parsed_once(self):
+        parsed_phonenumbers.clear()
+        with patch('phonenumbers.parse', wraps=phonenumbers.parse) as parse:
+            for value in ['8 929 100-00-01', '+79291000001', '89291000001']:
+                normalize_phonenumber(value)
+        # the E.164 form is known after the first parse
+        self.assertEqual(parse.call_count, 2)
+
+
+class RegisterOrderPhonenumberTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed_catalog(products_count=1, restaurants_count=1)
+        cls.product = Product.objects.get()
+
+    def setUp(self):
+        cache.clear()
+        parsed_phonenumbers.clear()
+
+    def register_order(self, phonenumber):
+        return self.client.post('/api/order/', {
+            'products': [{'product': self.product.id, 'quantity': 1}],
+            'firstname': 'Иван',
+            'lastname': 'Петров',
+            'phonenumber': phonenumber,
+            'address': 'Москва, Тверская 1',
+        }, content_type='application/json')
+
+    def test_number_is_parsed_once_per_process(self):
+        with patch('phonenumbers.parse', wraps=phonenumbers.parse) as parse:
+            first_response = self.register_order('8 929 100-00-00')
+            second_response = self.register_order('8 929 100-00-00')
+            orders = list(Order.objects.all())
+
+        self.assertEqual(parse.call_count, 1)
+        self.assertEqual(first_response.status_code, 200)
+        self.assertEqual(second_response.status_code, 200)
+        self.assertEqual(
+            [str(order.phonenumber) for order in orders],
+            ['+79291000000', '+79291000000'],
+        )
+
+    def test_invalid_number_is_rejected(self):
+        with self.assertLogs('django.request', 'WARNING'):
+            response = self.register_order('+7 000 000-00-00')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('phonenumber', response.json())
+
+
+def make_image_file(width, height, mode='RGB', color=(200, 100, 50)):
+    buffer = BytesIO()
+    Image.new(mode, (width, height), color).save(buffer, 'PNG')
+    return ContentFile(buffer.getvalue(), name='burger.png')
+
+
+@override_settings(PRODUCT_IMAGE_WIDTHS=[100, 200, 400])
+@patch('foodcartapp.images.features.check', return_value=WEBP_SUPPORTED)
+class ImageVariantsTest(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        media_settings = override_settings(MEDIA_ROOT=media_root.name)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+    def get_formats(self, variants):
+        formats = set()
+        for variant in variants:
+            with default_storage.open(variant['name']) as file, \
+                    Image.open(file) as image:
+                formats.add((image.format, variant['type']))
+        return formats
+
+    def test_images_are_not_upscaled(self, check):
+        variants = generate_image_variants(make_image_file(300, 150))
+
+        self.assertEqual({variant['width'] for variant in variants},
+                         {100, 200, 300})
+        for variant in variants:
+            with default_storage.open(variant['name']) as file, \
+                    Image.open(file) as image:
+                self.assertEqual(image.width, variant['width'])
+                self.assertEqual(image.height, variant['width'] // 2)
+
+    def test_names_depend_on_content(self, check):
+        variants = generate_image_variants(make_image_file(150, 150))
+        same_variants = generate_image_variants(make_image_file(150, 150))
+        other_variants = generate_image_variants(
+            make_image_file(150, 150, color=(0, 0, 0))
+        )
+
+        self.assertEqual(variants, same_variants)
+        self.assertFalse(
+            {variant['name'] for variant in variants}
+            & {variant['name'] for variant in other_variants}
+        )
+
+    def test_existing_variants_are_reused(self, check):
+        generate_image_variants(make_image_file(150, 150))
+
+        with patch('foodcartapp.images.encode_variant') as encode_variant:
+            generate_image_variants(make_image_file(150, 150))
+
+        encode_variant.assert_not_called()
+
+    def test_formats(self, check):
+        opaque_variants = generate_image_variants(make_image_file(50, 50))
+        transparent_variants = generate_image_variants(
+            make_image_file(50, 50, mode='RGBA', color=(0, 0, 0, 0))
+        )
+
+        self.assertEqual(
+            {image_format for image_format, _
+             in self.get_formats(opaque_variants)} - {'WEBP'},
+            {'JPEG'},
+        )
+        self.assertEqual(
+            {image_format for image_format, _
+             in self.get_formats(transparent_variants)} - {'WEBP'},
+            {'PNG'},
+        )
+
+    @skipUnless(WEBP_SUPPORTED, 'Pillow собран без WebP')
+    def test_webp_variants(self, check):
+        variants = generate_image_variants(make_image_file(150, 150))
+
+        self.assertEqual(self.get_formats(variants), {
+            ('JPEG', 'image/jpeg'), ('WEBP', 'image/webp'),
+        })
+
+    def test_variants_are_saved_to_product(self, check):
+        product = Product.objects.create(name='Бургер', price=100,
+                                         image=make_image_file(150, 150))
+
+        self.assertTrue(update_product_image_variants(product))
+
+        product.refresh_from_db()
+        self.assertEqual({variant['width'] for variant
+                          in product.image_variants}, {100, 150})
+
+    def test_variants_of_replaced_image_are_dropped(self, check):
+        product = Product.objects.create(name='Бургер', price=100,
+                                         image=make_image_file(150, 150))
+        Product.objects.filter(pk=product.pk).update(image_variants=[])
+
+        def replace_image(image_file):
+            variants = generate_image_variants(image_file)
+            # the manager uploads another image meanwhile
+            Product.objects.filter(pk=product.pk).update(image='other.png')
+            return variants
+
+        with patch('foodcartapp.images.generate_image_variants',
+                   side_effect=replace_image):
+            self.assertFalse(update_product_image_variants(product))
+
+        product.refresh_from_db()
+        self.assertEqual(product.image_variants, [])
+
+    def test_broken_image_is_skipped(self, check):
+        product = Product.objects.create(
+            name='Бургер', price=100,
+            image=ContentFile(b'not an image', name='burger.png'),
+        )
+
+        with self.assertLogs('foodcartapp.images', 'WARNING'):
+            self.assertFalse(update_product_image_variants(product))
+
+    def test_srcset_and_fallback_url(self, check):
+        variants = [
+            {'name': 'v/a-100w.jpg', 'width': 100, 'type': 'image/jpeg'},
+            {'name': 'v/a-100w.webp', 'width': 100, 'type': 'image/webp'},
+            {'name': 'v/a-200w.jpg', 'width': 200, 'type': 'image/jpeg'},
+            {'name': 'v/a-200w.webp', 'width': 200, 'type': 'image/webp'},
+        ]
+
+        self.assertEqual(get_srcset(variants, 'image/webp'), [
+            {'url': '/media/v/a-100w.webp', 'width': 100,
+             'type': 'image/webp'},
+            {'url': '/media/v/a-200w.webp', 'width': 200,
+             'type': 'image/webp'},
+        ])
+        self.assertEqual(len(get_srcset(variants)), 4)
+        self.assertEqual(get_variant_url(variants, 150), '/media/v/a-200w.jpg')
+        self.assertEqual(get_variant_url(variants, 500), '/media/v/a-200w.jpg')
+        self.assertEqual(get_variant_url(variants, 50), '/media/v/a-100w.jpg')
+        self.assertIsNone(get_variant_url([], 50))
@@ -1,12 +1,16 @@
 from django.urls import path
 
-from .views import product_list_api, banners_list_api, register_order
+from .views import (product_list_api, product_changes_api, banners_list_api,
+                    register_order, order_status, import_orders_api)
 
 
 app_name = "foodcartapp"
 
 urlpatterns = [
     path('products/', product_list_api),
+    path('products/changes/', product_changes_api),
     path('banners/', banners_list_api),
     path('order/', register_order),
+    path('order/import/', import_orders_api),
+    path('order/status/<slug:tracking_id>/', order_status),
 ]
@@ -1,19 +1,39 @@
 
-import phonenumbers
+import json
+from functools import lru_cache
+
+from django.conf import settings
 from django.db import transaction
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.templatetags.static import static
-from phonenumbers import PhoneNumberFormat, is_valid_number
-from rest_framework.decorators import api_view
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from django.views.decorators.vary import vary_on_headers
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import BasePermission
 from rest_framework.response import Response
-from rest_framework.serializers import ModelSerializer, ValidationError
-
-from .models import Order, OrderItem, Product
-
-
-def banners_list_api(request):
+from rest_framework.serializers import ValidationError
+
+from jobs.queue import enqueue
+
+from .catalog import (CatalogChangesExpired, filter_catalog,
+                      get_catalog_changes, get_catalog_etag,
+                      get_catalog_last_modified, get_catalog_page,
+                      get_catalog_payload, get_catalog_query,
+                      parse_changes_token)
+from .idempotency import (MAX_KEY_LENGTH, IdempotencyKeyReused,
+                          get_request_hash, run_once)
+from .imports import import_orders
+from .intake import QUEUED, get_intake_status, spool_order
+from .models import Order, OrderItem
+from .payloads import json_response, payload_response, render_payload
+from .serializers import OrderSerializer
+
+
+@lru_cache(maxsize=None)
+def get_banners_payload():
     # FIXME move data to db?
-    return JsonResponse([
+    return render_payload([
         {
             'title': 'Burger',
             'src': static('burger.jpg'),
@@ -29,80 +49,70 @@ def banners_list_api(request):
             'src': static('tasty.jpg'),
             'text': 'Food is incomplete without a tasty dessert',
         }
-    ], safe=False, json_dumps_params={
-        'ensure_ascii': False,
-        'indent': 4,
-    })
-
-
-def product_list_api(request):
-    products = Product.objects.select_related('category').available()
-
-    dumped_products = []
-    for product in products:
-        dumped_product = {
-            'id': product.id,
-            'name': product.name,
-            'price': product.price,
-            'special_status': product.special_status,
-            'description': product.description,
-            'category': {
-                'id': product.category.id,
-                'name': product.category.name,
-            } if product.category else None,
-            'image': product.image.url,
-            'restaurant': {
-                'id': product.id,
-                'name': product.name,
-            }
-        }
-        dumped_products.append(dumped_product)
-    return JsonResponse(dumped_products, safe=False, json_dumps_params={
-        'ensure_ascii': False,
-        'indent': 4,
-    })
+    ])
 
 
-class OrderItemSerializer(ModelSerializer):
-    class Meta:
-        model = OrderItem
-        fields = ['product', 'quantity']
-
-
-class OrderSerializer(ModelSerializer):
-    products = OrderItemSerializer(many=True,
-                                   allow_null=False,
-                                   write_only=True)
+@vary_on_headers('Accept-Encoding')
+def banners_list_api(request):
+    return payload_response(request, get_banners_payload())
 
-    class Meta:
-        model = Order
-        fields = ['products',
-                  'id',
-                  'firstname',
-                  'lastname',
-                  'phonenumber',
-                  'address']
 
-    def validate_products(self, value):
-        if not value:
-            raise ValidationError('Этот список не может быть пустым.')
-        return value
+@vary_on_headers('Accept-Encoding')
+@cache_control(no_cache=True)
+@condition(etag_func=get_catalog_etag,
+           last_modified_func=get_catalog_last_modified)
+def product_list_api(request):
+    query = get_catalog_query(request)
+    if query.errors:
+        return JsonResponse(query.errors, status=400,
+                            json_dumps_params={'ensure_ascii': False})
+    if not query.validated_data:
+        return payload_response(request, get_catalog_payload(request))
+
+    filters = {
+        name: value for name, value in query.validated_data.items()
+        if name in ['category', 'restaurant', 'special_status', 'ids']
+    }
+    dumped_products, next_cursor = get_catalog_page(
+        filter_catalog(**filters),
+        fields=query.validated_data.get('fields'),
+        cursor=query.validated_data.get('cursor'),
+        limit=query.validated_data.get('limit'),
+    )
+    if 'limit' not in query.validated_data:
+        return json_response(request, dumped_products)
+
+    next_url = None
+    if next_cursor is not None:
+        params = request.GET.copy()
+        params['cursor'] = next_cursor
+        next_url = request.build_absolute_uri(
+            f'{request.path}?{params.urlencode()}'
+        )
+    return json_response(request, {
+        'next': next_url,
+        'results': dumped_products,
+    })
 
-    def validate_phonenumber(self, value):
-        parsed_phone = phonenumbers.parse(value, "RU")
-        if not is_valid_number(parsed_phone):
-            raise ValidationError('Введен некорректный номер телефона.')
 
-        standardized_phone = phonenumbers.format_number(
-            parsed_phone, PhoneNumberFormat.E164
-        )
-        return standardized_phone
+@cache_control(no_cache=True)
+def product_changes_api(request):
+    since = None
+    if request.GET.get('since'):
+        try:
+            since = parse_changes_token(request.GET['since'])
+        except CatalogChangesExpired as error:
+            return JsonResponse({'since': error.detail}, status=410,
+                                json_dumps_params={'ensure_ascii': False})
+        except ValidationError as error:
+            return JsonResponse({'since': error.detail}, status=400,
+                                json_dumps_params={'ensure_ascii': False})
+    return json_response(request, get_catalog_changes(since))
 
 
-@api_view(['POST'])
 @transaction.atomic
-def register_order(request):
-    serializer = OrderSerializer(data=request.data)
+def create_order(data):
+    serializer = OrderSerializer(data=data)
     serializer.is_valid(raise_exception=True)
     order = Order.objects.create(
         firstname=serializer.validated_data['firstname'],
@@ -117,6 +127,82 @@ def register_order(request):
         for fields in order_items_fields
     ]
     OrderItem.objects.bulk_create(order_items)
-    response_data = serializer.data
+    enqueue('foodcartapp.geocode_order', {'order_id': order.id})
+    response_data = dict(serializer.data)
     response_data['id'] = order.id
+    return order, response_data
+
+
+def accept_order(data):
+    serializer = OrderSerializer(data=data)
+    serializer.is_valid(raise_exception=True)
+    tracking_id = spool_order(serializer.validated_data)
+    return None, {'tracking_id': tracking_id, 'status': QUEUED}
+
+
+def get_order_intake():
+    if settings.ORDER_INTAKE_MODE == 'buffered':
+        return accept_order
+    return create_order
+
+
+def get_order_response(response_data):
+    # buffered intake has no order yet, only a tracking id
+    if 'tracking_id' in response_data:
+        return Response(response_data, status=202)
     return Response(response_data)
+
+
+@api_view(['POST'])
+def register_order(request):
+    intake = get_order_intake()
+    idempotency_key = request.headers.get('Idempotency-Key')
+    if not idempotency_key:
+        _, response_data = intake(request.data)
+        return get_order_response(response_data)
+
+    if len(idempotency_key) > MAX_KEY_LENGTH:
+        return Response(
+            {'Idempotency-Key': [
+                f'Ключ длиннее {MAX_KEY_LENGTH} символов.'
+            ]},
+            status=400,
+        )
+    try:
+        response_data = run_once(
+            idempotency_key,
+            get_request_hash(request.data),
+            lambda: intake(request.data),
+        )
+    except IdempotencyKeyReused as error:
+        return Response({'Idempotency-Key': [str(error)]}, status=422)
+    return get_order_response(response_data)
+
+
+@api_view(['GET'])
+def order_status(request, tracking_id):
+    status, order_id = get_intake_status(tracking_id)
+    if not status:
+        return Response({'detail': 'Заказ не найден.'}, status=404)
+    return Response({
+        'tracking_id': tracking_id,
+        'status': status,
+        'id': order_id,
+    })
+
+
+class CanImportOrders(BasePermission):
+    def has_permission(self, request, view):
+        return request.user.has_perm('foodcartapp.add_order')
+
+
+@api_view(['POST'])
+@permission_classes([CanImportOrders])
+def import_orders_api(request):
+    # the body is read line by line while the report is streamed back
+    report = (
+        json.dumps(row, ensure_ascii=False) + '\n'
+        for row in import_orders(request._request)
+    )
+    return StreamingHttpResponse(report,
+                                 content_type='application/x-ndjson')
@@ -0,0 +1,38 @@
+import re
+import unicodedata
+
+ABBREVIATIONS = {
+    'г': 'город',
+    'гор': 'город',
+    'обл': 'область',
+    'р-н': 'район',
+    'мкр': 'микрорайон',
+    'мкрн': 'микрорайон',
+    'ул': 'улица',
+    'пр-т': 'проспект',
+    'пр-кт': 'проспект',
+    'просп': 'проспект',
+    'пр-д': 'проезд',
+    'пер': 'переулок',
+    'пл': 'площадь',
+    'ш': 'шоссе',
+    'б-р': 'бульвар',
+    'бул': 'бульвар',
+    'наб': 'набережная',
+    'туп': 'тупик',
+    'д': 'дом',
+    'к': 'корпус',
+    'корп': 'корпус',
+    'стр': 'строение',
+    'кв': 'квартира',
+}
+
+WORD_PATTERN = re.compile(r'\w+(?:-\w+)*')
+
+
+def canonicalize_address(address):
+    address = unicodedata.normalize('NFKC', address).lower().replace('ё', 'е')
+    return ' '.join(
+        ABBREVIATIONS.get(word, word)
+        for word in WORD_PATTERN.findall(address)
+    )
@@ -0,0 +1,109 @@
+import json
+import random
+import threading
+import time
+from functools import lru_cache
+from hashlib import sha256
+
+import requests
+from django.conf import settings
+from django.utils.module_loading import import_string
+from requests.adapters import HTTPAdapter
+
+from geolocation.addresses import canonicalize_address
+
+
+class GeocodingError(Exception):
+    pass
+
+
+class GeocoderUnavailable(GeocodingError):
+    pass
+
+
+class BaseGeocoder:
+    def geocode(self, address):
+        # returns (lon, lat) or None if the address is not found
+        raise NotImplementedError
+
+
+class YandexGeocoder(BaseGeocoder):
+    base_url = 'https://geocode-maps.yandex.ru/1.x'
+
+    def __init__(self, apikey=None, timeout=None):
+        self.apikey = apikey or settings.YANDEX_GEOCODER_API_KEY
+        self.timeout = timeout or (
+            settings.GEOCODER_CONNECT_TIMEOUT, settings.GEOCODER_TIMEOUT
+        )
+        self._local = threading.local()
+
+    def get_session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1)
+            session.mount('https://', adapter)
+            self._local.session = session
+        return session
+
+    def geocode(self, address):
+        response = self.get_session().get(self.base_url, params={
+            'geocode': address,
+            'apikey': self.apikey,
+            'format': 'json',
+        }, timeout=self.timeout)
+        response.raise_for_status()
+
+        found_places = response.json()['response']['GeoObjectCollection']['featureMember']
+        if not found_places:
+            return
+
+        most_relevant = found_places[0]
+        lon, lat = most_relevant['GeoObject']['Point']['pos'].split(' ')
+        return lon, lat
+
+
+class OfflineGeocoder(BaseGeocoder):
+    def __init__(self, bbox=(37.35, 55.55, 37.85, 55.95), not_found_share=0):
+        self.min_lon, self.min_lat, self.max_lon, self.max_lat = bbox
+        self.not_found_share = not_found_share
+
+    def geocode(self, address):
+        digest = sha256(canonicalize_address(address).encode('utf-8')).digest()
+        lon_share, lat_share, not_found_share = (
+            int.from_bytes(digest[start:start + 8], 'big') / 2 ** 64
+            for start in (0, 8, 16)
+        )
+        if not_found_share < self.not_found_share:
+            return
+        lon = self.min_lon + (self.max_lon - self.min_lon) * lon_share
+        lat = self.min_lat + (self.max_lat - self.min_lat) * lat_share
+        return lon, lat
+
+
+class ReplayGeocoder(BaseGeocoder):
+    def __init__(self, path, latency=0, jitter=0, missing_as_not_found=True):
+        with open(path, encoding='utf-8') as file:
+            self.responses = {
+                canonicalize_address(address): coordinates
+                for address, coordinates in json.load(file).items()
+            }
+        self.latency = latency
+        self.jitter = jitter
+        self.missing_as_not_found = missing_as_not_found
+
+    def geocode(self, address):
+        time.sleep(self.latency + random.uniform(0, self.jitter))
+        address_key = canonicalize_address(address)
+        if address_key not in self.responses:
+            if self.missing_as_not_found:
+                return
+            raise GeocodingError(f'Нет записанного ответа для {address}')
+        coordinates = self.responses[address_key]
+        return tuple(coordinates) if coordinates else None
+
+
+@lru_cache(maxsize=None)
+def get_geocoder():
+    backend = import_string(settings.GEOCODER['BACKEND'])
+    return backend(**settings.GEOCODER.get('OPTIONS', {}))
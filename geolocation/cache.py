@@ -0,0 +1,73 @@
+import threading
+import time
+from collections import OrderedDict
+from hashlib import md5
+
+from django.core.cache import cache
+
+NOT_FOUND = (None, None)
+
+
+class LRUCache:
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return
+            value, expires_at = item
+            if expires_at <= time.monotonic():
+                del self._items[key]
+                return
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        with self._lock:
+            self._items[key] = (value, time.monotonic() + ttl)
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+
+def get_shared_cache_key(address_key):
+    digest = md5(address_key.encode('utf-8')).hexdigest()
+    return f'geolocation:location:{digest}'
+
+
+def get_shared_locations(address_keys):
+    keys = {
+        get_shared_cache_key(address_key): address_key
+        for address_key in address_keys
+    }
+    return {
+        keys[key]: coordinates
+        for key, coordinates in cache.get_many(keys).items()
+    }
+
+
+def set_shared_location(address_key, coordinates, ttl):
+    cache.set(get_shared_cache_key(address_key), coordinates, ttl)
+
+
+def delete_shared_locations(address_keys):
+    cache.delete_many([
+        get_shared_cache_key(address_key) for address_key in address_keys
+    ])
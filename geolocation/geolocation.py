@@ -1,28 +1,128 @@
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait
+from hashlib import md5
+
 import requests
 from django.conf import settings
 from django.utils import timezone
 
+from geolocation.addresses import canonicalize_address
+from geolocation.backends import (GeocoderUnavailable, GeocodingError,
+                                  get_geocoder)
+from geolocation.cache import (NOT_FOUND, LRUCache, get_shared_locations,
+                               set_shared_location)
+from geolocation.metrics import increment as increment_metrics
 from geolocation.models import Location
+from geolocation.resilience import CircuitBreaker, RetryBudget, TokenBucket
+from geolocation.spatial import invalidate_spatial_indexes
+from jobs.queue import enqueue
+
+GEOCODER_ERRORS = (GeocodingError, requests.RequestException, KeyError,
+                   ValueError)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+rate_limiter = TokenBucket(
+    'geolocation:geocoder:rate',
+    rate=settings.GEOCODER_RATE_LIMIT,
+    capacity=settings.GEOCODER_RATE_LIMIT_BURST,
+)
+circuit_breaker = CircuitBreaker(
+    'geolocation:geocoder:breaker',
+    failure_threshold=settings.GEOCODER_BREAKER_THRESHOLD,
+    failure_window=settings.GEOCODER_BREAKER_WINDOW,
+    recovery_timeout=settings.GEOCODER_BREAKER_RECOVERY,
+)
+
+local_cache = LRUCache(
+    maxsize=settings.GEOCODER_LOCAL_CACHE_SIZE,
+    ttl=settings.GEOCODER_LOCAL_CACHE_TTL,
+)
+
 
-APIKEY = settings.YANDEX_GEOCODER_API_KEY
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.GEOCODER_MAX_WORKERS,
+                thread_name_prefix='geocoder',
+            )
+    return _executor
 
 
-def fetch_coordinates(address, apikey=APIKEY):
-    base_url = 'https://geocode-maps.yandex.ru/1.x'
-    response = requests.get(base_url, params={
-        'geocode': address,
-        'apikey': apikey,
-        'format': 'json',
-    })
-    response.raise_for_status()
+def is_retryable(error):
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        status_code = error.response.status_code
+        return status_code == 429 or status_code >= 500
+    return isinstance(error, (requests.ConnectionError, requests.Timeout))
 
-    found_places = response.json()['response']['GeoObjectCollection']['featureMember']
-    if not found_places:
-        return
 
-    most_relevant = found_places[0]
-    lon, lat = most_relevant['GeoObject']['Point']['pos'].split(' ')
-    return lon, lat
+def fetch_coordinates(address, retry_budget=None):
+    attempt = 0
+    while True:
+        if not circuit_breaker.allow():
+            increment_metrics({'breaker_rejections': 1})
+            raise GeocoderUnavailable('Геокодер временно недоступен')
+        waited = rate_limiter.acquire(settings.GEOCODER_RATE_LIMIT_MAX_WAIT)
+        if waited is None:
+            increment_metrics({'limiter_rejections': 1})
+            raise GeocoderUnavailable('Превышен лимит запросов к геокодеру')
+        if waited:
+            increment_metrics({
+                'limiter_waits': 1,
+                'limiter_wait_ms': int(waited * 1000),
+            })
+
+        try:
+            coordinates = get_geocoder().geocode(address)
+        except GEOCODER_ERRORS as error:
+            if circuit_breaker.record_failure():
+                increment_metrics({'breaker_opened': 1})
+            if not is_retryable(error):
+                raise
+            if not retry_budget or not retry_budget.spend():
+                increment_metrics({'retry_budget_exhausted': 1})
+                raise
+            increment_metrics({'retries': 1})
+            time.sleep(settings.GEOCODER_RETRY_BACKOFF * 2 ** attempt)
+            attempt += 1
+            continue
+        circuit_breaker.record_success()
+        return coordinates
+
+
+def fetch_coordinates_batch(addresses,
+                            batch_timeout=settings.GEOCODER_BATCH_TIMEOUT):
+    # None in the result means "not found", failed and timed out
+    # addresses are left out so that they are retried next time
+    addresses = list(dict.fromkeys(addresses))
+    if not addresses:
+        return {}
+    if not circuit_breaker.allow():
+        increment_metrics({'breaker_rejections': len(addresses)})
+        return {}
+
+    retry_budget = RetryBudget(settings.GEOCODER_RETRY_BUDGET)
+    executor = get_executor()
+    futures = {
+        executor.submit(fetch_coordinates, address, retry_budget): address
+        for address in addresses
+    }
+    done, not_done = wait(futures, timeout=batch_timeout)
+    for future in not_done:
+        future.cancel()
+
+    coordinates = {}
+    for future in done:
+        try:
+            coordinates[futures[future]] = future.result()
+        except GEOCODER_ERRORS:
+            continue
+    return coordinates
 
 
 def get_distance_with_units(distance):
@@ -34,20 +134,199 @@ def get_distance_with_units(distance):
     return distance_with_units
 
 
+def get_location_ttl(coordinates):
+    if coordinates == NOT_FOUND:
+        return settings.GEOCODER_NEGATIVE_TTL
+    return settings.GEOCODER_LOCATION_TTL
+
+
+def remember_location(address_key, coordinates, ttl, shared=True):
+    local_cache.set(address_key, coordinates, ttl)
+    if shared:
+        set_shared_location(address_key, coordinates, ttl)
+
+
+def find_locations(address_keys, metrics):
+    locations = {}
+    missing_keys = []
+    for address_key in address_keys:
+        coordinates = local_cache.get(address_key)
+        if coordinates is None:
+            missing_keys.append(address_key)
+            continue
+        metrics['local_negative_hits' if coordinates == NOT_FOUND
+                else 'local_hits'] += 1
+        locations[address_key] = coordinates
+
+    for address_key, coordinates in get_shared_locations(missing_keys).items():
+        metrics['shared_negative_hits' if coordinates == NOT_FOUND
+                else 'shared_hits'] += 1
+        remember_location(address_key, coordinates,
+                          get_location_ttl(coordinates), shared=False)
+        locations[address_key] = coordinates
+    missing_keys = [
+        address_key for address_key in missing_keys
+        if address_key not in locations
+    ]
+
+    now = timezone.now()
+    stale_locations = {}
+    latest_locations = {
+        location.address_key: location
+        for location in Location.objects
+        .filter(address_key__in=missing_keys)
+        .order_by('updated_at')
+    }
+    for address_key, location in latest_locations.items():
+        coordinates = (location.lon, location.lat)
+        if location.lat is None or location.lon is None:
+            coordinates = NOT_FOUND
+        age = (now - location.updated_at).total_seconds()
+        ttl = get_location_ttl(coordinates) - age
+        if ttl <= 0:
+            metrics['db_stale'] += 1
+            stale_locations[address_key] = location
+            continue
+        metrics['db_negative_hits' if coordinates == NOT_FOUND
+                else 'db_hits'] += 1
+        remember_location(address_key, coordinates, ttl)
+        locations[address_key] = coordinates
+    missing_keys = [
+        address_key for address_key in missing_keys
+        if address_key not in locations
+    ]
+    return locations, missing_keys, stale_locations
+
+
+def get_address_keys(addresses):
+    return {address: canonicalize_address(address) for address in addresses}
+
+
+def get_found_locations(address_keys, locations):
+    found_locations = {}
+    for address, address_key in address_keys.items():
+        coordinates = locations.get(address_key, NOT_FOUND)
+        if coordinates != NOT_FOUND:
+            found_locations[address] = coordinates
+    return found_locations
+
+
+def get_locations(*addresses):
+    metrics = Counter()
+    address_keys = get_address_keys(addresses)
+    locations, missing_keys, stale_locations = find_locations(
+        dict.fromkeys(address_keys.values()), metrics
+    )
+    increment_metrics(metrics)
+    for address_key, location in stale_locations.items():
+        if location.lat is not None and location.lon is not None:
+            locations[address_key] = (location.lon, location.lat)
+    if missing_keys:
+        missing_addresses = list({
+            address_key: address
+            for address, address_key in reversed(address_keys.items())
+            if address_key in missing_keys
+        }.values())
+        enqueue(
+            'geolocation.geocode_addresses',
+            {'addresses': missing_addresses},
+            key=get_geocoding_job_key(missing_keys),
+        )
+    return get_found_locations(address_keys, locations)
+
+
 def get_or_create_locations(*addresses):
-    existed_locations = {
-        location.address: (location.lon, location.lat)
-        for location in Location.objects.filter(address__in=addresses)
+    metrics = Counter()
+    address_keys = get_address_keys(addresses)
+    locations, missing_keys, stale_locations = find_locations(
+        dict.fromkeys(address_keys.values()), metrics
+    )
+    key_addresses = {
+        address_key: address
+        for address, address_key in reversed(address_keys.items())
+        if address_key in missing_keys
     }
-    for address in addresses:
-        if address in existed_locations.keys():
+
+    metrics['misses'] += len(missing_keys)
+    fetched_coordinates = fetch_coordinates_batch(key_addresses.values())
+    now = timezone.now()
+    new_locations = []
+    updated_locations = []
+    moved_locations = []
+    for address_key, address in key_addresses.items():
+        if address not in fetched_coordinates:
+            metrics['remote_errors'] += 1
+            stale_location = stale_locations.get(address_key)
+            if stale_location and stale_location.lat is not None:
+                locations[address_key] = (
+                    stale_location.lon, stale_location.lat
+                )
             continue
-        coordinates = fetch_coordinates(address)
-        if not coordinates:
+
+        lon, lat = fetched_coordinates[address] or NOT_FOUND
+        if lon is None:
+            metrics['remote_not_found'] += 1
+            coordinates = NOT_FOUND
+        else:
+            metrics['remote_found'] += 1
+            coordinates = (float(lon), float(lat))
+
+        location = stale_locations.get(address_key)
+        if location:
+            if (location.lon, location.lat) != coordinates:
+                moved_locations.append(location)
+            location.lon, location.lat = coordinates
+            location.updated_at = now
+            updated_locations.append(location)
+        else:
+            new_locations.append(Location(
+                address=address,
+                address_key=address_key,
+                lon=coordinates[0],
+                lat=coordinates[1],
+            ))
+        remember_location(address_key, coordinates,
+                          get_location_ttl(coordinates))
+        locations[address_key] = coordinates
+
+    Location.objects.bulk_create(new_locations, ignore_conflicts=True)
+    Location.objects.bulk_update(
+        updated_locations, ['lon', 'lat', 'updated_at']
+    )
+    if moved_locations:
+        invalidate_spatial_indexes()
+    increment_metrics(metrics)
+    return get_found_locations(address_keys, locations)
+
+
+def refresh_locations(locations):
+    fetched_coordinates = fetch_coordinates_batch(
+        location.address for location in locations
+    )
+    now = timezone.now()
+    refreshed_locations = []
+    moved_locations = []
+    for location in locations:
+        if location.address not in fetched_coordinates:
             continue
-        lon, lat = coordinates
-        location = Location.objects.create(
-            address=address, lon=lon, lat=lat
-        )
-        existed_locations[location.address] = (location.lon, location.lat)
-    return existed_locations
\ No newline at end of file
+        lon, lat = fetched_coordinates[location.address] or NOT_FOUND
+        coordinates = NOT_FOUND if lon is None else (float(lon), float(lat))
+        if (location.lon, location.lat) != coordinates:
+            moved_locations.append(location)
+        location.lon, location.lat = coordinates
+        location.updated_at = now
+        refreshed_locations.append(location)
+        remember_location(location.address_key, coordinates,
+                          get_location_ttl(coordinates))
+
+    Location.objects.bulk_update(
+        refreshed_locations, ['lon', 'lat', 'updated_at']
+    )
+    if moved_locations:
+        invalidate_spatial_indexes()
+    return refreshed_locations
+
+
+def get_geocoding_job_key(address_keys):
+    digest = md5('\n'.join(sorted(address_keys)).encode('utf-8')).hexdigest()
+    return f'geolocation.geocode_addresses:{digest}'
@@ -0,0 +1,22 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from geolocation.models import Location
+
+
+class Command(BaseCommand):
+    help = 'Сохраняет известные координаты адресов в файл для ReplayGeocoder'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='путь к JSON-файлу')
+
+    def handle(self, *args, **options):
+        responses = {}
+        locations = Location.objects.values_list('address', 'lon', 'lat')
+        for address, lon, lat in locations.iterator():
+            responses[address] = [lon, lat] if lat is not None else None
+
+        with open(options['path'], 'w', encoding='utf-8') as file:
+            json.dump(responses, file, ensure_ascii=False, indent=2)
+        self.stdout.write(f'Сохранено адресов: {len(responses)}')
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from geolocation.geolocation import circuit_breaker
+from geolocation.metrics import get_metrics, reset_metrics
+
+
+class Command(BaseCommand):
+    help = 'Показывает счётчики кэша геокодера и состояние защиты от сбоев'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='обнулить счётчики после вывода',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'breaker_state: {circuit_breaker.get_state()}')
+        for name, value in get_metrics().items():
+            self.stdout.write(f'{name}: {value}')
+        if options['reset']:
+            reset_metrics()
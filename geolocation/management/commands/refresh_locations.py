@@ -0,0 +1,104 @@
+import json
+import os
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from geolocation.geolocation import refresh_locations
+from geolocation.models import Location
+
+
+class Command(BaseCommand):
+    help = 'Заново геокодирует устаревшие и ненайденные адреса'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than',
+            type=int,
+            default=settings.GEOCODER_LOCATION_TTL // (24 * 60 * 60),
+            help='обновлять адреса, которые геокодировались раньше, '
+                 'чем столько дней назад',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='сколько адресов геокодировать за раз',
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=1,
+            help='пауза между пачками в секундах',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            default=settings.REFRESH_LOCATIONS_CHECKPOINT,
+            help='файл, в котором запоминается прогресс',
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='начать сначала, не читая сохранённый прогресс',
+        )
+
+    def handle(self, *args, **options):
+        checkpoint_path = options['checkpoint']
+        checkpoint = {}
+        if not options['restart'] and os.path.exists(checkpoint_path):
+            with open(checkpoint_path, encoding='utf-8') as file:
+                checkpoint = json.load(file)
+            self.stdout.write(
+                f'Продолжаю с адреса id={checkpoint["last_id"]}'
+            )
+
+        started_at = timezone.now()
+        if checkpoint:
+            started_at = parse_datetime(checkpoint['started_at'])
+        stale_before = started_at - timedelta(days=options['older_than'])
+        last_id = checkpoint.get('last_id', 0)
+        stale_locations = Location.objects.filter(
+            Q(updated_at__lt=stale_before)
+            | Q(lat__isnull=True)
+            | Q(lon__isnull=True),
+            updated_at__lt=started_at,
+        ).order_by('id')
+
+        refreshed_count = 0
+        failed_count = 0
+        while True:
+            locations = list(stale_locations.filter(id__gt=last_id)[
+                :options['batch_size']
+            ])
+            if not locations:
+                break
+
+            refreshed_locations = refresh_locations(locations)
+            refreshed_count += len(refreshed_locations)
+            failed_count += len(locations) - len(refreshed_locations)
+            last_id = locations[-1].id
+            self.save_checkpoint(checkpoint_path, {
+                'started_at': started_at.isoformat(),
+                'last_id': last_id,
+            })
+            self.stdout.write(
+                f'Обновлено {refreshed_count}, не удалось {failed_count}'
+            )
+            time.sleep(options['pause'])
+
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: обновлено {refreshed_count}, не удалось {failed_count}'
+        ))
+
+    def save_checkpoint(self, path, checkpoint):
+        temporary_path = f'{path}.tmp'
+        with open(temporary_path, 'w', encoding='utf-8') as file:
+            json.dump(checkpoint, file)
+        os.replace(temporary_path, path)
@@ -0,0 +1,51 @@
+from collections import Counter
+
+from django.core.cache import cache
+
+METRICS_KEY_PREFIX = 'geolocation:metrics:'
+
+METRICS = [
+    'local_hits',
+    'local_negative_hits',
+    'shared_hits',
+    'shared_negative_hits',
+    'db_hits',
+    'db_negative_hits',
+    'db_stale',
+    'misses',
+    'remote_found',
+    'remote_not_found',
+    'remote_errors',
+    'retries',
+    'retry_budget_exhausted',
+    'breaker_opened',
+    'breaker_rejections',
+    'limiter_waits',
+    'limiter_wait_ms',
+    'limiter_rejections',
+]
+
+
+def increment(counters):
+    for name, value in Counter(counters).items():
+        if not value:
+            continue
+        key = f'{METRICS_KEY_PREFIX}{name}'
+        cache.add(key, 0, timeout=None)
+        try:
+            cache.incr(key, value)
+        except ValueError:
+            cache.set(key, value, timeout=None)
+
+
+def get_metrics():
+    keys = [f'{METRICS_KEY_PREFIX}{name}' for name in METRICS]
+    values = cache.get_many(keys)
+    return {
+        name: values.get(key, 0)
+        for name, key in zip(METRICS, keys)
+    }
+
+
+def reset_metrics():
+    cache.delete_many([f'{METRICS_KEY_PREFIX}{name}' for name in METRICS])
@@ -0,0 +1,34 @@
+# Generated by Django 4.1 on 2026-10-18 12:40
+
+from django.db import migrations, models
+
+from geolocation.addresses import canonicalize_address
+
+
+def fill_address_keys(apps, schema_editor):
+    Location = apps.get_model('geolocation', 'Location')
+    locations = []
+    for location in Location.objects.only('id', 'address').iterator():
+        location.address_key = canonicalize_address(location.address)
+        locations.append(location)
+        if len(locations) >= 1000:
+            Location.objects.bulk_update(locations, ['address_key'])
+            locations = []
+    Location.objects.bulk_update(locations, ['address_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geolocation', '0002_alter_location_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='location',
+            name='address_key',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=200, verbose_name='нормализованный адрес'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_address_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.1 on 2026-10-18 18:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geolocation', '0004_location_address_key'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='location',
+            name='address',
+            field=models.CharField(max_length=200, unique=True, verbose_name='адрес'),
+        ),
+        migrations.AlterField(
+            model_name='location',
+            name='address_key',
+            field=models.CharField(db_index=True, editable=False, max_length=500, verbose_name='нормализованный адрес'),
+        ),
+    ]
@@ -1,11 +1,46 @@
 from django.db import models
 
+from .addresses import canonicalize_address
+
+
+class LocationQuerySet(models.QuerySet):
+    def in_bulk_by_address(self, addresses):
+        address_keys = {
+            address: canonicalize_address(address) for address in addresses
+        }
+        locations = {
+            location.address_key: location
+            for location in self
+            .filter(address_key__in=set(address_keys.values()))
+            .order_by('updated_at')
+        }
+        return {
+            address: locations[address_key]
+            for address, address_key in address_keys.items()
+            if address_key in locations
+        }
+
 
 class Location(models.Model):
-    address = models.CharField('адрес', max_length=100, unique=True)
+    # as long as the longest address that is geocoded, see Order.address
+    address = models.CharField('адрес', max_length=200, unique=True)
+    address_key = models.CharField(
+        'нормализованный адрес',
+        # abbreviations are expanded, so the key may be longer
+        max_length=500,
+        db_index=True,
+        editable=False,
+    )
     lat = models.FloatField('широта', null=True, blank=True)
     lon = models.FloatField('долгота', null=True, blank=True)
     updated_at = models.DateTimeField('дата запроса к геокодеру', auto_now=True)
 
+    objects = LocationQuerySet.as_manager()
+
     def __str__(self):
         return f'{self.address} ({self.lat}, {self.lon})'
+
+    def save(self, *args, **kwargs):
+        self.address_key = canonicalize_address(self.address)
+        super().save(*args, **kwargs)
+
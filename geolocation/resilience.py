@@ -0,0 +1,100 @@
+import math
+import threading
+import time
+
+from django.core.cache import cache
+
+
+class TokenBucket:
+    # GCRA flavour of the token bucket: the shared cache keeps only the
+    # "theoretical arrival time" of the next token, so a check costs one
+    # read and one write. Concurrent writers may let a few extra requests
+    # through, which is acceptable for throttling.
+    def __init__(self, key, rate, capacity):
+        self.key = key
+        self.interval = 1 / rate
+        self.capacity = capacity
+
+    def consume(self, tokens=1):
+        now = time.time()
+        arrival_time = max(cache.get(self.key) or now, now)
+        new_arrival_time = arrival_time + self.interval * tokens
+        allowed_at = new_arrival_time - self.interval * self.capacity
+        if allowed_at > now:
+            return allowed_at - now
+        cache.set(
+            self.key,
+            new_arrival_time,
+            timeout=math.ceil(new_arrival_time - now) + 1,
+        )
+        return 0
+
+    def acquire(self, max_wait):
+        waited = 0
+        while True:
+            retry_after = self.consume()
+            if not retry_after:
+                return waited
+            if waited + retry_after > max_wait:
+                return
+            time.sleep(retry_after)
+            waited += retry_after
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold, failure_window,
+                 recovery_timeout):
+        self.failures_key = f'{name}:failures'
+        self.open_until_key = f'{name}:open_until'
+        self.failure_threshold = failure_threshold
+        self.failure_window = failure_window
+        self.recovery_timeout = recovery_timeout
+
+    def get_state(self):
+        open_until = cache.get(self.open_until_key)
+        if open_until is None:
+            return 'closed'
+        if open_until > time.time():
+            return 'open'
+        return 'half-open'
+
+    def allow(self):
+        return self.get_state() != 'open'
+
+    def record_success(self):
+        cache.delete_many([self.failures_key, self.open_until_key])
+
+    def record_failure(self):
+        cache.add(self.failures_key, 0, timeout=self.failure_window)
+        try:
+            failures = cache.incr(self.failures_key)
+        except ValueError:
+            failures = 1
+        if failures < self.failure_threshold:
+            return False
+        # stays half-open after the recovery timeout, so a single failed
+        # probe request opens the breaker again
+        cache.set(
+            self.open_until_key,
+            time.time() + self.recovery_timeout,
+            timeout=self.recovery_timeout + self.failure_window,
+        )
+        cache.set(
+            self.failures_key,
+            self.failure_threshold - 1,
+            timeout=self.recovery_timeout + self.failure_window,
+        )
+        return True
+
+
+class RetryBudget:
+    def __init__(self, retries):
+        self.retries = retries
+        self._lock = threading.Lock()
+
+    def spend(self):
+        with self._lock:
+            if self.retries <= 0:
+                return False
+            self.retries -= 1
+            return True
@@ -0,0 +1,114 @@
+import math
+from collections import defaultdict
+from itertools import product
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+
+from geolocation.distances import haversine_matrix
+
+KM_PER_DEGREE = 111.195
+MAX_SEARCH_KM = 20040
+SPATIAL_INDEXES_VERSION_KEY = 'geolocation:spatial:version'
+
+_local_indexes = {}
+
+
+class GridIndex:
+    def __init__(self, cell_size_km=2):
+        self.cell_size_km = cell_size_km
+        self.cell_size = cell_size_km / KM_PER_DEGREE
+        self.cells = defaultdict(set)
+        self.points = {}
+        self.version = None
+
+    def get_cell(self, lat, lon):
+        return (
+            math.floor(lat / self.cell_size),
+            math.floor(lon / self.cell_size),
+        )
+
+    def add(self, key, lat, lon):
+        self.remove(key)
+        self.points[key] = (lat, lon)
+        self.cells[self.get_cell(lat, lon)].add(key)
+
+    def remove(self, key):
+        point = self.points.pop(key, None)
+        if point is None:
+            return
+        cell = self.get_cell(*point)
+        self.cells[cell].discard(key)
+        if not self.cells[cell]:
+            del self.cells[cell]
+
+    def __len__(self):
+        return len(self.points)
+
+    def get_cells_around(self, lat, lon, radius_km):
+        lat_delta = radius_km / KM_PER_DEGREE
+        lat_cos = math.cos(math.radians(min(abs(lat) + lat_delta, 90)))
+        lon_delta = 180 if lat_cos < 1e-6 else min(lat_delta / lat_cos, 180)
+        min_row, min_column = self.get_cell(lat - lat_delta, lon - lon_delta)
+        max_row, max_column = self.get_cell(lat + lat_delta, lon + lon_delta)
+
+        rows = range(min_row, max_row + 1)
+        columns = range(min_column, max_column + 1)
+        if len(rows) * len(columns) > len(self.cells):
+            return [
+                (row, column) for row, column in self.cells
+                if row in rows and column in columns
+            ]
+        return product(rows, columns)
+
+    def within(self, lat, lon, radius_km, predicate=None):
+        keys = [
+            key
+            for cell in self.get_cells_around(lat, lon, radius_km)
+            for key in self.cells.get(cell, ())
+            if predicate is None or predicate(key)
+        ]
+        if not keys:
+            return []
+        distances = haversine_matrix(
+            [(lat, lon)], [self.points[key] for key in keys]
+        )[0]
+        found = [
+            (key, float(distance))
+            for key, distance in zip(keys, distances)
+            if distance <= radius_km
+        ]
+        found.sort(key=lambda pair: pair[1])
+        return found
+
+    def nearest(self, lat, lon, limit=None, radius_km=None, predicate=None):
+        max_radius_km = radius_km or MAX_SEARCH_KM
+        search_km = min(self.cell_size_km, max_radius_km)
+        while True:
+            found = self.within(lat, lon, search_km, predicate)
+            if limit and len(found) >= limit or search_km >= max_radius_km:
+                return found[:limit]
+            search_km = min(search_km * 2, max_radius_km)
+
+
+def invalidate_spatial_indexes():
+    # a counter would start over after the cache is flushed and make
+    # indexes kept by the processes look current again
+    cache.set(SPATIAL_INDEXES_VERSION_KEY, uuid4().hex, timeout=None)
+
+
+def get_spatial_index(name, fill_index):
+    version = cache.get(SPATIAL_INDEXES_VERSION_KEY)
+    if version is None:
+        cache.add(SPATIAL_INDEXES_VERSION_KEY, uuid4().hex, timeout=None)
+        version = cache.get(SPATIAL_INDEXES_VERSION_KEY)
+    index = _local_indexes.get(name)
+    if index is not None and version is not None and index.version == version:
+        return index
+
+    index = GridIndex(settings.GEO_GRID_CELL_KM)
+    fill_index(index)
+    index.version = version
+    _local_indexes[name] = index
+    return index
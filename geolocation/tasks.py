@@ -0,0 +1,14 @@
+from geolocation.geolocation import GeocodingError, get_or_create_locations
+from geolocation.models import Location
+from jobs.queue import task
+
+
+@task('geolocation.geocode_addresses')
+def geocode_addresses(addresses):
+    get_or_create_locations(*addresses)
+    geocoded_locations = Location.objects.in_bulk_by_address(addresses)
+    failed_addresses = set(addresses) - geocoded_locations.keys()
+    if failed_addresses:
+        raise GeocodingError(
+            f'Не удалось геокодировать: {", ".join(sorted(failed_addresses))}'
+        )
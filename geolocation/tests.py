@@ -1,3 +1,482 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from geopy.distance import distance
+
+from .addresses import canonicalize_address
+from .backends import BaseGeocoder, GeocodingError, OfflineGeocoder
+from .cache import NOT_FOUND, LRUCache, delete_shared_locations
+from .distances import haversine_matrix
+from .geolocation import (fetch_coordinates_batch, get_or_create_locations,
+                          local_cache)
+from .metrics import get_metrics
+from .models import Location
+from .resilience import CircuitBreaker, RetryBudget, TokenBucket
+from .spatial import GridIndex
+
+MOSCOW_POINTS = [
+    (55.753595, 37.621031),
+    (55.729548, 37.603745),
+    (55.794229, 37.700772),
+    (55.611636, 37.737468),
+    (55.888474, 37.430295),
+]
+
+
+class HaversineMatrixTest(SimpleTestCase):
+    def test_matches_geodesic_distance(self):
+        matrix = haversine_matrix(MOSCOW_POINTS, MOSCOW_POINTS)
+
+        for row, origin in enumerate(MOSCOW_POINTS):
+            for column, destination in enumerate(MOSCOW_POINTS):
+                geodesic_km = distance(origin, destination).km
+                self.assertAlmostEqual(
+                    matrix[row, column], geodesic_km,
+                    delta=max(geodesic_km * 0.005, 0.001),
+                )
+
+    def test_empty_input(self):
+        self.assertEqual(haversine_matrix([], MOSCOW_POINTS).shape, (0, 5))
+
+
+class GridIndexTest(SimpleTestCase):
+    def setUp(self):
+        self.index = GridIndex(cell_size_km=1)
+        for number, (lat, lon) in enumerate(MOSCOW_POINTS):
+            self.index.add(number, lat, lon)
+
+    def test_nearest_matches_full_sort(self):
+        lat, lon = MOSCOW_POINTS[0]
+        distances = haversine_matrix([(lat, lon)], MOSCOW_POINTS)[0]
+        expected = sorted(range(len(MOSCOW_POINTS)), key=distances.__getitem__)
+
+        nearest = self.index.nearest(lat, lon, limit=3)
+
+        self.assertEqual([key for key, _ in nearest], expected[:3])
+
+    def test_radius_and_predicate(self):
+        lat, lon = MOSCOW_POINTS[0]
+
+        nearest = self.index.nearest(
+            lat, lon, radius_km=18, predicate=lambda key: key != 0
+        )
+
+        self.assertEqual([key for key, _ in nearest], [1, 2, 3])
+        self.assertTrue(all(distance <= 18 for _, distance in nearest))
+
+    def test_remove(self):
+        self.index.remove(1)
+
+        self.assertNotIn(1, self.index.points)
+        self.assertEqual(len(self.index), 4)
+
+
+class CanonicalizeAddressTest(SimpleTestCase):
+    def test_spelling_variants_share_key(self):
+        variants = [
+            'Москва, Тверская 1',
+            'москва , тверская 1',
+            'Москва, Тверская 1  ',
+            'МОСКВА,ТВЕРСКАЯ 1',
+        ]
+
+        keys = {canonicalize_address(address) for address in variants}
+
+        self.assertEqual(keys, {'москва тверская 1'})
+
+    def test_expands_abbreviations(self):
+        self.assertEqual(
+            canonicalize_address('г. Москва, ул. Тверская, д. 1, корп. 2'),
+            canonicalize_address('город Москва, улица Тверская, дом 1, корпус 2'),
+        )
+
+    def test_keeps_hyphenated_words(self):
+        self.assertEqual(
+            canonicalize_address('Ленинский пр-т, 5'),
+            'ленинский проспект 5',
+        )
+
+
+class LocationByAddressTest(TestCase):
+    def test_finds_location_by_spelling_variant(self):
+        location = Location.objects.create(
+            address='Москва, Тверская 1', lat=55.75, lon=37.61
+        )
+
+        locations = Location.objects.in_bulk_by_address(
+            ['москва , тверская 1', 'Москва, Арбат 2']
+        )
+
+        self.assertEqual(locations, {'москва , тверская 1': location})
+
+
+class LRUCacheTest(SimpleTestCase):
+    def test_evicts_least_recently_used(self):
+        lru_cache = LRUCache(maxsize=2, ttl=60)
+        lru_cache.set('a', 1)
+        lru_cache.set('b', 2)
+        lru_cache.get('a')
+
+        lru_cache.set('c', 3)
+
+        self.assertEqual(len(lru_cache), 2)
+        self.assertIsNone(lru_cache.get('b'))
+        self.assertEqual(lru_cache.get('a'), 1)
+        self.assertEqual(lru_cache.get('c'), 3)
+
+    @patch('geolocation.cache.time.monotonic')
+    def test_expires_items(self, monotonic):
+        monotonic.return_value = 100
+        lru_cache = LRUCache(maxsize=10, ttl=60)
+        lru_cache.set('a', 1)
+        lru_cache.set('b', 2, ttl=10)
+        lru_cache.set('c', 3, ttl=600)
+
+        monotonic.return_value = 130
+
+        self.assertEqual(lru_cache.get('a'), 1)
+        self.assertIsNone(lru_cache.get('b'))
+
+        monotonic.return_value = 160
+
+        self.assertIsNone(lru_cache.get('a'))
+        self.assertIsNone(lru_cache.get('c'))
+        self.assertEqual(len(lru_cache), 0)
+
+
+class OfflineGeocoderTest(SimpleTestCase):
+    def test_is_deterministic_and_inside_bbox(self):
+        geocoder = OfflineGeocoder(bbox=(37, 55, 38, 56))
+
+        lon, lat = geocoder.geocode('Москва, Тверская 1')
+
+        self.assertEqual(geocoder.geocode('москва , тверская 1'), (lon, lat))
+        self.assertTrue(37 <= lon <= 38 and 55 <= lat <= 56)
+
+    def test_not_found_share(self):
+        geocoder = OfflineGeocoder(not_found_share=1)
+
+        self.assertIsNone(geocoder.geocode('Москва, Тверская 1'))
+
+
+class TokenBucketTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_allows_burst_then_asks_to_wait(self):
+        bucket = TokenBucket('test:bucket', rate=1, capacity=2)
+
+        self.assertEqual(bucket.consume(), 0)
+        self.assertEqual(bucket.consume(), 0)
+        self.assertAlmostEqual(bucket.consume(), 1, delta=0.1)
+
+    def test_acquire_gives_up_after_max_wait(self):
+        bucket = TokenBucket('test:bucket', rate=1, capacity=1)
+        bucket.consume()
+
+        self.assertIsNone(bucket.acquire(max_wait=0.1))
+
+
+class CircuitBreakerTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.breaker = CircuitBreaker(
+            'test:breaker',
+            failure_threshold=2,
+            failure_window=60,
+            recovery_timeout=30,
+        )
+
+    def test_opens_after_threshold(self):
+        self.assertFalse(self.breaker.record_failure())
+        self.assertTrue(self.breaker.record_failure())
+
+        self.assertEqual(self.breaker.get_state(), 'open')
+        self.assertFalse(self.breaker.allow())
+
+    def test_success_closes(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+
+        self.breaker.record_success()
+
+        self.assertEqual(self.breaker.get_state(), 'closed')
+
+
+class RetryBudgetTest(SimpleTestCase):
+    def test_is_spent(self):
+        budget = RetryBudget(1)
+
+        self.assertTrue(budget.spend())
+        self.assertFalse(budget.spend())
+
+
+class StubGeocoder(BaseGeocoder):
+    def __init__(self):
+        self.calls = []
+        self.release = threading.Event()
+
+    def geocode(self, address):
+        self.calls.append(address)
+        if address.startswith('медленный'):
+            self.release.wait(5)
+        if address.startswith('сломанный'):
+            raise GeocodingError('сломан')
+        if address.startswith('несуществующий'):
+            return None
+        return OfflineGeocoder().geocode(address)
+
+
+class GeocodeBatchTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+        self.geocoder = StubGeocoder()
+        patcher = patch('geolocation.geolocation.get_geocoder',
+                        return_value=self.geocoder)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.geocoder.release.set)
+
+    def test_failed_and_late_addresses_are_left_out(self):
+        coordinates = fetch_coordinates_batch(
+            ['Москва, Тверская 1', 'несуществующий адрес',
+             'сломанный адрес', 'медленный адрес'],
+            batch_timeout=0.3,
+        )
+
+        self.assertEqual(
+            coordinates.keys(), {'Москва, Тверская 1', 'несуществующий адрес'}
+        )
+        self.assertIsNone(coordinates['несуществующий адрес'])
+
+    def test_addresses_not_started_by_deadline_are_cancelled(self):
+        with ThreadPoolExecutor(max_workers=1) as executor, \
+                patch('geolocation.geolocation.get_executor',
+                      return_value=executor):
+            coordinates = fetch_coordinates_batch(
+                ['медленный адрес', 'Москва, Тверская 1'],
+                batch_timeout=0.1,
+            )
+            self.geocoder.release.set()
+
+        self.assertEqual(coordinates, {})
+        self.assertEqual(self.geocoder.calls, ['медленный адрес'])
+
+    def test_new_locations_are_inserted_in_bulk(self):
+        long_address = 'Москва, ' + 'очень длинная улица ' * 9
+        addresses = [long_address, 'несуществующий адрес', 'сломанный адрес']
+
+        with self.assertNumQueries(2):
+            locations = get_or_create_locations(*addresses)
+
+        self.assertEqual(locations.keys(), {long_address})
+        self.assertEqual(
+            set(Location.objects.values_list('address', 'lat')),
+            {(long_address, locations[long_address][1]),
+             ('несуществующий адрес', None)},
+        )
+
+
+@override_settings(GEOCODER_LOCATION_TTL=3600, GEOCODER_NEGATIVE_TTL=60)
+class FindLocationsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+        self.geocoder = StubGeocoder()
+        patcher = patch('geolocation.geolocation.get_geocoder',
+                        return_value=self.geocoder)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def make_older(self, address, seconds):
+        Location.objects.filter(address=address).update(
+            updated_at=timezone.now() - timedelta(seconds=seconds)
+        )
+
+    def get_counters(self, *names):
+        metrics = get_metrics()
+        return {name: metrics[name] for name in names}
+
+    def forget(self, address):
+        local_cache.clear()
+        delete_shared_locations([canonicalize_address(address)])
+
+    def test_found_location_is_cached_at_every_level(self):
+        address = 'Москва, Тверская 1'
+        coordinates = get_or_create_locations(address)[address]
+
+        get_or_create_locations(address)
+        local_cache.clear()
+        get_or_create_locations(address)
+        self.forget(address)
+        self.assertEqual(get_or_create_locations(address)[address],
+                         coordinates)
+
+        self.assertEqual(self.geocoder.calls, [address])
+        self.assertEqual(
+            self.get_counters('misses', 'remote_found', 'local_hits',
+                              'shared_hits', 'db_hits'),
+            {'misses': 1, 'remote_found': 1, 'local_hits': 1,
+             'shared_hits': 1, 'db_hits': 1},
+        )
+
+    def test_not_found_address_is_cached_for_negative_ttl(self):
+        address = 'несуществующий адрес'
+        get_or_create_locations(address)
+        self.assertEqual(local_cache.get(canonicalize_address(address)),
+                         NOT_FOUND)
+
+        self.assertEqual(get_or_create_locations(address), {})
+        self.forget(address)
+        self.make_older(address, 30)
+        self.assertEqual(get_or_create_locations(address), {})
+
+        self.assertEqual(self.geocoder.calls, [address])
+        self.assertEqual(
+            self.get_counters('remote_not_found', 'local_negative_hits',
+                              'db_negative_hits', 'db_stale'),
+            {'remote_not_found': 1, 'local_negative_hits': 1,
+             'db_negative_hits': 1, 'db_stale': 0},
+        )
+
+    def test_not_found_address_is_fetched_again_after_negative_ttl(self):
+        address = 'несуществующий адрес'
+        get_or_create_locations(address)
+        self.forget(address)
+        self.make_older(address, 61)
+
+        get_or_create_locations(address)
+
+        self.assertEqual(self.geocoder.calls, [address, address])
+        self.assertEqual(get_metrics()['db_stale'], 1)
+        self.assertEqual(Location.objects.count(), 1)
+
+    def test_stale_location_is_refreshed(self):
+        address = 'Москва, Тверская 1'
+        Location.objects.create(address=address, lat=1, lon=2)
+        self.make_older(address, 3601)
+
+        locations = get_or_create_locations(address)
+
+        location = Location.objects.get()
+        self.assertEqual(locations[address], (location.lon, location.lat))
+        self.assertNotEqual(location.lat, 1)
+        self.assertGreater(location.updated_at,
+                           timezone.now() - timedelta(minutes=1))
+        self.assertEqual(get_metrics()['db_stale'], 1)
+
+    def test_stale_location_is_used_if_refresh_fails(self):
+        address = 'сломанный адрес'
+        Location.objects.create(address=address, lat=1, lon=2)
+        self.make_older(address, 3601)
+
+        locations = get_or_create_locations(address)
+
+        self.assertEqual(locations, {address: (2, 1)})
+        self.assertEqual(self.geocoder.calls, [address])
+        self.assertEqual(get_metrics()['remote_errors'], 1)
+
+
+class RefreshLocationsCommandTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+        patcher = patch('geolocation.geolocation.get_geocoder',
+                        return_value=OfflineGeocoder())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.checkpoint_path = os.path.join(directory.name, 'checkpoint.json')
+
+        self.now = timezone.now()
+        self.locations = {}
+        for address, age_days in [
+            ('Москва, Тверская 1', 100),
+            ('Москва, Арбат 1', 35),
+            ('Москва, Тверская 2', 100),
+            ('Москва, Арбат 2', 1),
+        ]:
+            location = Location.objects.create(address=address, lat=1, lon=1)
+            Location.objects.filter(pk=location.pk).update(
+                updated_at=self.now - timedelta(days=age_days)
+            )
+            self.locations[address] = location
+
+    def call_command(self, *args):
+        call_command('refresh_locations', '--older-than=30', '--pause=0',
+                     f'--checkpoint={self.checkpoint_path}', *args,
+                     stdout=StringIO())
+
+    def save_checkpoint(self):
+        # the previous run has started ten days ago and stopped after
+        # the first address
+        with open(self.checkpoint_path, 'w', encoding='utf-8') as file:
+            json.dump({
+                'started_at': (self.now - timedelta(days=10)).isoformat(),
+                'last_id': self.locations['Москва, Тверская 1'].id,
+            }, file)
+
+    def get_refreshed_addresses(self):
+        return set(
+            Location.objects
+            .filter(updated_at__gte=self.now)
+            .values_list('address', flat=True)
+        )
+
+    def test_refreshes_stale_locations(self):
+        self.call_command()
+
+        self.assertEqual(self.get_refreshed_addresses(), {
+            'Москва, Тверская 1', 'Москва, Арбат 1', 'Москва, Тверская 2',
+        })
+        self.assertNotEqual(Location.objects.get(id=self.locations[
+            'Москва, Тверская 1'].id).lat, 1)
+        self.assertFalse(os.path.exists(self.checkpoint_path))
+
+    def test_resumes_from_checkpoint(self):
+        self.save_checkpoint()
+
+        self.call_command()
+
+        # ages are counted from the start of the previous run, so Арбат 1
+        # is not stale yet
+        self.assertEqual(self.get_refreshed_addresses(),
+                         {'Москва, Тверская 2'})
+        self.assertFalse(os.path.exists(self.checkpoint_path))
+
+    def test_restart_ignores_checkpoint(self):
+        self.save_checkpoint()
+
+        self.call_command('--restart')
+
+        self.assertEqual(self.get_refreshed_addresses(), {
+            'Москва, Тверская 1', 'Москва, Арбат 1', 'Москва, Тверская 2',
+        })
+
+    def test_checkpoint_is_saved_after_each_batch(self):
+        with patch(
+            'geolocation.management.commands.refresh_locations'
+            '.refresh_locations',
+            side_effect=[[self.locations['Москва, Тверская 1']],
+                         KeyboardInterrupt],
+        ), self.assertRaises(KeyboardInterrupt):
+            self.call_command('--batch-size=1')
+
+        with open(self.checkpoint_path, encoding='utf-8') as file:
+            checkpoint = json.load(file)
+        self.assertEqual(checkpoint['last_id'],
+                         self.locations['Москва, Тверская 1'].id)
+        self.assertGreaterEqual(checkpoint['started_at'],
+                                self.now.isoformat())
@@ -0,0 +1,37 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = [
+        'id',
+        'task',
+        'status',
+        'attempts',
+        'run_at',
+        'updated_at',
+    ]
+    list_filter = [
+        'status',
+        'task',
+    ]
+    search_fields = [
+        'task',
+        'key',
+    ]
+    readonly_fields = [
+        'created_at',
+        'updated_at',
+    ]
+    actions = [
+        'requeue',
+    ]
+
+    @admin.action(description='Поставить в очередь заново')
+    def requeue(self, request, queryset):
+        queryset.exclude(status=Job.RUNNING).update(
+            status=Job.QUEUED, attempts=0, run_at=timezone.now()
+        )
@@ -0,0 +1,67 @@
+import multiprocessing
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from jobs.queue import claim_job, run_job
+
+
+def run_worker(stop_event, poll_interval):
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    while not stop_event.is_set():
+        close_old_connections()
+        job = claim_job()
+        if not job:
+            stop_event.wait(poll_interval)
+            continue
+        run_job(job)
+    connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Запускает процессы, выполняющие фоновые задачи'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=settings.JOB_WORKERS,
+            help='число процессов',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=settings.JOB_POLL_INTERVAL,
+            help='пауза в секундах, если очередь пуста',
+        )
+
+    def handle(self, *args, **options):
+        context = multiprocessing.get_context('fork')
+        stop_event = context.Event()
+
+        def stop(signum, frame):
+            stop_event.set()
+
+        signal.signal(signal.SIGINT, stop)
+        signal.signal(signal.SIGTERM, stop)
+
+        # forked workers must not share the parent's database connection
+        connections.close_all()
+        workers = [
+            context.Process(
+                target=run_worker,
+                args=(stop_event, options['poll_interval']),
+                daemon=True,
+            )
+            for _ in range(options['workers'])
+        ]
+        for worker in workers:
+            worker.start()
+        self.stdout.write(f'Запущено процессов: {len(workers)}')
+
+        for worker in workers:
+            worker.join()
+        self.stdout.write('Процессы остановлены')
@@ -0,0 +1,18 @@
+# Generated by Django 4.1 on 2026-10-18 18:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='job',
+            name='key',
+            field=models.CharField(blank=True, db_index=True, help_text='не ставить задачу повторно, пока задача с тем же ключом ждёт запуска', max_length=200, verbose_name='ключ'),
+        ),
+    ]
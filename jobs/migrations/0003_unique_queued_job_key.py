@@ -0,0 +1,34 @@
+# Generated by Django 4.1 on 2026-10-18 18:42
+
+from django.db import migrations, models
+
+
+def drop_duplicate_queued_jobs(apps, schema_editor):
+    Job = apps.get_model('jobs', 'Job')
+    kept_job_ids = {}
+    duplicate_job_ids = []
+    queued_jobs = (
+        Job.objects.filter(status='QUEUED').exclude(key='')
+        .order_by('run_at', 'id').values_list('id', 'key')
+    )
+    for job_id, key in queued_jobs.iterator():
+        if key in kept_job_ids:
+            duplicate_job_ids.append(job_id)
+        else:
+            kept_job_ids[key] = job_id
+    Job.objects.filter(id__in=duplicate_job_ids).delete()
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0002_job_key_help_text'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_queued_jobs,
+                             migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='job',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'QUEUED'), models.Q(('key', ''), _negated=True)), fields=('key',), name='unique_queued_job_key'),
+        ),
+    ]
@@ -0,0 +1,80 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    QUEUED = 'QUEUED'
+    RUNNING = 'RUNNING'
+    DONE = 'DONE'
+    DEAD = 'DEAD'
+    STATUS_CHOICES = (
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (DEAD, 'Не выполнена'),
+    )
+    task = models.CharField(
+        'задача',
+        max_length=100,
+    )
+    payload = models.JSONField(
+        'параметры',
+        default=dict,
+        blank=True,
+    )
+    key = models.CharField(
+        'ключ',
+        max_length=200,
+        blank=True,
+        db_index=True,
+        help_text='не ставить задачу повторно, пока задача с тем же '
+                  'ключом ждёт запуска',
+    )
+    status = models.CharField(
+        'статус',
+        max_length=7,
+        choices=STATUS_CHOICES,
+        default=QUEUED,
+    )
+    attempts = models.PositiveIntegerField(
+        'попыток',
+        default=0,
+    )
+    max_attempts = models.PositiveIntegerField(
+        'максимум попыток',
+        default=5,
+    )
+    run_at = models.DateTimeField(
+        'запустить не раньше',
+        default=timezone.now,
+    )
+    last_error = models.TextField(
+        'последняя ошибка',
+        blank=True,
+    )
+    created_at = models.DateTimeField(
+        'создана',
+        default=timezone.now,
+    )
+    updated_at = models.DateTimeField(
+        'обновлена',
+        auto_now=True,
+    )
+
+    class Meta:
+        verbose_name = 'задача'
+        verbose_name_plural = 'задачи'
+        ordering = ['run_at']
+        indexes = [
+            models.Index(fields=['status', 'run_at']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['key'],
+                condition=models.Q(status='QUEUED') & ~models.Q(key=''),
+                name='unique_queued_job_key',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.task} #{self.id}'
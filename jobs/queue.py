@@ -0,0 +1,132 @@
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+TASKS = {}
+
+
+def task(name):
+    def decorator(func):
+        TASKS[name] = func
+        return func
+    return decorator
+
+
+def enqueue(task_name, payload=None, key='', run_at=None, max_attempts=None):
+    while True:
+        if key:
+            # a running job may have already read its inputs, which could
+            # have changed since, so only a job that has not started yet
+            # is reused
+            existed_job = Job.objects.filter(key=key,
+                                             status=Job.QUEUED).first()
+            if existed_job:
+                return existed_job
+        try:
+            with transaction.atomic():
+                return Job.objects.create(
+                    task=task_name,
+                    payload=payload or {},
+                    key=key,
+                    run_at=run_at or timezone.now(),
+                    max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+                )
+        except IntegrityError:
+            # another process has queued a job with the same key since
+            # the check above, see Job.Meta.constraints
+            continue
+
+
+def enqueue_many(task_name, payloads):
+    now = timezone.now()
+    return Job.objects.bulk_create(
+        Job(
+            task=task_name,
+            payload=payload,
+            run_at=now,
+            max_attempts=settings.JOB_MAX_ATTEMPTS,
+        )
+        for payload in payloads
+    )
+
+
+def get_retry_delay(attempts):
+    delay = settings.JOB_RETRY_BACKOFF * 2 ** (attempts - 1)
+    return timedelta(seconds=min(delay, settings.JOB_RETRY_BACKOFF_MAX))
+
+
+def claim_job():
+    now = timezone.now()
+    with transaction.atomic():
+        job = (
+            Job.objects
+            .select_for_update(skip_locked=True)
+            .filter(status__in=[Job.QUEUED, Job.RUNNING], run_at__lte=now)
+            .order_by('run_at')
+            .first()
+        )
+        if not job:
+            return
+        # a RUNNING job is claimable again only after its lease has expired,
+        # which means the worker that took it has died
+        job.status = Job.RUNNING
+        job.attempts += 1
+        job.run_at = now + timedelta(seconds=settings.JOB_LEASE_TIMEOUT)
+        job.save(update_fields=['status', 'attempts', 'run_at', 'updated_at'])
+    return job
+
+
+def run_job(job):
+    lease = job.run_at
+    handler = TASKS.get(job.task)
+    try:
+        if not handler:
+            job.attempts = job.max_attempts
+            raise LookupError(f'Unknown task {job.task}')
+        handler(**job.payload)
+    except Exception:
+        logger.exception('Job %s failed', job)
+        job.last_error = traceback.format_exc()
+        if job.attempts >= job.max_attempts:
+            job.status = Job.DEAD
+        else:
+            job.status = Job.QUEUED
+            job.run_at = timezone.now() + get_retry_delay(job.attempts)
+    else:
+        job.status = Job.DONE
+        job.last_error = ''
+
+    if not save_job_result(job, lease):
+        logger.warning('Job %s lost its lease, the result is dropped', job)
+        job.refresh_from_db()
+    return job
+
+
+def save_job_result(job, lease):
+    # the job is claimed again once its lease expires, so the result is
+    # saved only while the lease is still ours
+    claimed_jobs = Job.objects.filter(pk=job.pk, status=Job.RUNNING,
+                                      run_at=lease)
+    result = {
+        'status': job.status,
+        'run_at': job.run_at,
+        'last_error': job.last_error,
+        'updated_at': timezone.now(),
+    }
+    try:
+        with transaction.atomic():
+            return claimed_jobs.update(attempts=job.attempts, **result)
+    except IntegrityError:
+        # a job with the same key was queued while this one was running,
+        # it will run with fresh inputs, so this one is not retried
+        job.status = Job.DEAD
+        result['status'] = Job.DEAD
+        return claimed_jobs.update(attempts=job.attempts, **result)
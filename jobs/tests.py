@@ -0,0 +1,179 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.db import IntegrityError, transaction
+from django.db.models import QuerySet
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .models import Job
+from .queue import claim_job, enqueue, get_retry_delay, run_job, task
+
+calls = []
+
+
+@task('jobs.tests.record')
+def record(value):
+    calls.append(value)
+
+
+@task('jobs.tests.fail')
+def fail():
+    raise ValueError('boom')
+
+
+class EnqueueTest(TestCase):
+    def test_reuses_queued_job_with_same_key(self):
+        job = enqueue('jobs.tests.record', {'value': 1}, key='record')
+
+        self.assertEqual(enqueue('jobs.tests.record', key='record'), job)
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_running_job_does_not_block_new_one(self):
+        job = enqueue('jobs.tests.record', {'value': 1}, key='record')
+        claim_job()
+
+        new_job = enqueue('jobs.tests.record', {'value': 2}, key='record')
+
+        self.assertNotEqual(new_job, job)
+        self.assertEqual(new_job.status, Job.QUEUED)
+
+    def test_finished_jobs_do_not_block_new_one(self):
+        for status in (Job.DONE, Job.DEAD):
+            Job.objects.create(task='jobs.tests.record', key='record',
+                               status=status)
+
+        enqueue('jobs.tests.record', {'value': 1}, key='record')
+
+        self.assertEqual(Job.objects.filter(status=Job.QUEUED).count(), 1)
+
+    def test_database_keeps_one_queued_job_per_key(self):
+        Job.objects.create(task='jobs.tests.record', key='record')
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Job.objects.create(task='jobs.tests.record', key='record')
+        Job.objects.create(task='jobs.tests.record')
+        Job.objects.create(task='jobs.tests.record')
+
+    def test_reuses_job_queued_after_check(self):
+        job = Job.objects.create(task='jobs.tests.record', key='record')
+
+        # the first check misses the job queued by another process
+        with patch.object(QuerySet, 'first', autospec=True,
+                          side_effect=[None, job]) as first:
+            self.assertEqual(enqueue('jobs.tests.record', key='record'), job)
+        self.assertEqual(first.call_count, 2)
+        self.assertEqual(Job.objects.count(), 1)
+
+
+@override_settings(JOB_LEASE_TIMEOUT=60, JOB_MAX_ATTEMPTS=2,
+                   JOB_RETRY_BACKOFF=10, JOB_RETRY_BACKOFF_MAX=15)
+class ClaimAndRunJobTest(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_claims_due_jobs_in_order(self):
+        now = timezone.now()
+        later = enqueue('jobs.tests.record', {'value': 2},
+                        run_at=now - timedelta(seconds=1))
+        first = enqueue('jobs.tests.record', {'value': 1},
+                        run_at=now - timedelta(seconds=2))
+        enqueue('jobs.tests.record', {'value': 3},
+                run_at=now + timedelta(hours=1))
+
+        self.assertEqual(claim_job(), first)
+        self.assertEqual(claim_job(), later)
+        self.assertIsNone(claim_job())
+
+    def test_claim_takes_a_lease(self):
+        enqueue('jobs.tests.record', {'value': 1})
+        before = timezone.now()
+
+        job = claim_job()
+
+        self.assertEqual(job.status, Job.RUNNING)
+        self.assertEqual(job.attempts, 1)
+        self.assertGreaterEqual(job.run_at, before + timedelta(seconds=60))
+        self.assertIsNone(claim_job())
+
+    def test_expired_lease_is_claimed_again(self):
+        enqueue('jobs.tests.record', {'value': 1})
+        job = claim_job()
+        Job.objects.filter(pk=job.pk).update(
+            run_at=timezone.now() - timedelta(seconds=1)
+        )
+
+        reclaimed_job = claim_job()
+
+        self.assertEqual(reclaimed_job, job)
+        self.assertEqual(reclaimed_job.attempts, 2)
+
+    def test_successful_job_is_done(self):
+        enqueue('jobs.tests.record', {'value': 1})
+
+        job = run_job(claim_job())
+
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(calls, [1])
+
+    def test_failed_job_is_retried_with_backoff(self):
+        enqueue('jobs.tests.fail')
+        before = timezone.now()
+
+        with self.assertLogs('jobs.queue', 'ERROR'):
+            job = run_job(claim_job())
+
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertIn('boom', job.last_error)
+        self.assertGreaterEqual(job.run_at, before + timedelta(seconds=10))
+        self.assertLess(job.run_at, before + timedelta(seconds=60))
+
+    def test_job_is_dead_after_max_attempts(self):
+        job = enqueue('jobs.tests.fail')
+        for _ in range(2):
+            Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+            with self.assertLogs('jobs.queue', 'ERROR'):
+                job = run_job(claim_job())
+
+        self.assertEqual(job.status, Job.DEAD)
+        self.assertEqual(job.attempts, 2)
+        self.assertIsNone(claim_job())
+
+    def test_unknown_task_is_dead_at_once(self):
+        enqueue('jobs.tests.missing')
+
+        with self.assertLogs('jobs.queue', 'ERROR'):
+            job = run_job(claim_job())
+
+        self.assertEqual(job.status, Job.DEAD)
+
+    def test_result_is_dropped_after_lease_is_lost(self):
+        enqueue('jobs.tests.record', {'value': 1})
+        job = claim_job()
+        Job.objects.filter(pk=job.pk).update(
+            run_at=timezone.now() - timedelta(seconds=1)
+        )
+        reclaimed_job = claim_job()
+
+        with self.assertLogs('jobs.queue', 'WARNING'):
+            job = run_job(job)
+
+        self.assertEqual(job.status, Job.RUNNING)
+        self.assertEqual(job.run_at, reclaimed_job.run_at)
+        self.assertEqual(run_job(reclaimed_job).status, Job.DONE)
+
+    def test_failed_job_is_not_retried_if_same_key_is_queued(self):
+        enqueue('jobs.tests.fail', key='fail')
+        job = claim_job()
+        queued_job = enqueue('jobs.tests.fail', key='fail')
+
+        with self.assertLogs('jobs.queue', 'ERROR'):
+            job = run_job(job)
+
+        self.assertEqual(job.status, Job.DEAD)
+        self.assertEqual(Job.objects.get(status=Job.QUEUED), queued_job)
+
+    def test_retry_delay_doubles_up_to_maximum(self):
+        self.assertEqual(get_retry_delay(1), timedelta(seconds=10))
+        self.assertEqual(get_retry_delay(2), timedelta(seconds=15))
+        self.assertEqual(get_retry_delay(5), timedelta(seconds=15))
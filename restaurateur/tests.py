@@ -1,3 +1,87 @@
-from django.test import TestCase
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 
-# Create your tests here.
+from foodcartapp.models import (Order, OrderItem, Product, Restaurant,
+                                RestaurantMenuItem)
+from geolocation.models import Location
+from jobs.models import Job
+
+
+@override_settings(RESTAURANT_SEARCH_RADIUS_KM=50, RESTAURANT_SEARCH_LIMIT=1)
+class OrdersBoardTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        product = Product.objects.create(name='Бургер', price=100)
+        for name, lat, lon in [
+            ('Тверская', 55.7616, 37.6089),
+            ('Арбат', 55.7494, 37.5912),
+            ('Невский', 59.9343, 30.3351),
+        ]:
+            location = Location.objects.create(
+                address=f'{name}, 1', lat=lat, lon=lon
+            )
+            restaurant = Restaurant.objects.create(
+                name=name, address=location.address, location=location,
+            )
+            RestaurantMenuItem.objects.create(
+                restaurant=restaurant, product=product, availability=True,
+            )
+        self.product = product
+        self.client.force_login(
+            User.objects.create_user('manager', is_staff=True)
+        )
+
+    def create_order(self, address, lat, lon):
+        Location.objects.create(address=address, lat=lat, lon=lon)
+        order = Order.objects.create(
+            firstname='Иван', lastname='Петров', address=address,
+            phonenumber='+79291000000',
+        )
+        OrderItem.objects.create(order=order, product=self.product,
+                                 quantity=1, price=100)
+
+    def test_distant_restaurants_are_counted(self):
+        self.create_order('Москва, Кремль', 55.7520, 37.6175)
+
+        response = self.client.get(reverse('restaurateur:view_orders'))
+
+        self.assertContains(response, 'Тверская')
+        self.assertContains(response, 'И ещё ресторанов дальше: 2.')
+
+    def test_only_shown_restaurants_are_loaded(self):
+        self.create_order('Москва, Кремль', 55.7520, 37.6175)
+        self.client.get(reverse('restaurateur:view_orders'))
+        tverskaya = Restaurant.objects.get(name='Тверская')
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('restaurateur:view_orders'))
+
+        table = Restaurant._meta.db_table
+        restaurant_queries = [
+            query['sql'] for query in queries
+            if query['sql'].startswith('SELECT')
+            and f'FROM "{table}"' in query['sql']
+        ]
+        self.assertEqual(len(restaurant_queries), 1)
+        self.assertIn(f'IN ({tverskaya.id})', restaurant_queries[0])
+
+    def test_board_does_not_schedule_geocoding(self):
+        Restaurant.objects.update(location=None)
+        self.create_order('Москва, Кремль', 55.7520, 37.6175)
+        Job.objects.all().delete()
+
+        self.client.get(reverse('restaurateur:view_orders'))
+
+        self.assertFalse(Job.objects.exists())
+
+    def test_no_restaurants_within_radius(self):
+        self.create_order('Владивосток, Светланская 1', 43.1155, 131.8855)
+
+        response = self.client.get(reverse('restaurateur:view_orders'))
+
+        self.assertContains(response, 'находятся дальше 50')
+        self.assertNotContains(response, 'Ни один ресторан')
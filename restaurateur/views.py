@@ -1,15 +1,16 @@
 from django import forms
 from django.contrib.auth import authenticate, login
 from django.contrib.auth import views as auth_views
+from django.conf import settings
 from django.contrib.auth.decorators import user_passes_test
 from django.shortcuts import redirect, render
 from django.urls import reverse_lazy
 from django.views import View
-from geopy.distance import distance
 
-from foodcartapp.models import Order, Product, Restaurant, RestaurantMenuItem
-from geolocation.geolocation import (get_distance_with_units,
-                                     get_or_create_locations)
+from foodcartapp.availability import get_restaurant_availability
+from foodcartapp.models import Order, Product, Restaurant
+from foodcartapp.restaurant_locations import get_restaurant_index
+from geolocation.geolocation import get_distance_with_units, get_locations
 
 
 class Login(forms.Form):
@@ -96,43 +97,58 @@ def view_restaurants(request):
 @user_passes_test(is_manager, login_url='restaurateur:login')
 def view_orders(request):
     orders = Order.objects.filter(status='NEW').fetch_with_price()
-    restaurant_menu_items = RestaurantMenuItem.objects.all().select_related(
-        'restaurant', 'product'
-    )
 
-    order_addresses = [order.address for order in orders]
-    restaurant_addresses = [
-        restaurant.address for restaurant in Restaurant.objects.all()
-    ]
-    locations = get_or_create_locations(
-        *order_addresses, *restaurant_addresses
-    )
+    locations = get_locations(*(order.address for order in orders))
+
+    availability = get_restaurant_availability()
+    order_candidates = availability.match_orders(orders)
 
-    order_restaurants = []
+    restaurant_index = get_restaurant_index()
     for order in orders:
-        for order_product in order.items.all():
-            product_rests = set([
-                menu_item.restaurant for menu_item in restaurant_menu_items
-                if order_product.product == menu_item.product
-                and menu_item.availability
-            ])
-            order_restaurants.append(product_rests)
-        order_location = locations.get(order.address, None)
-        suitable_restaurants = set.intersection(*order_restaurants)
-        for restaurant in suitable_restaurants:
-            restaurant_location = locations.get(restaurant.address, None)
-            restaurant.distance = distance(
-                order_location, restaurant_location
-            ).km
-            restaurant.distance_text = get_distance_with_units(
-                restaurant.distance
+        candidate_ids = order_candidates[order.id]
+        order.suitable_restaurant_ids = []
+        order.distant_restaurants_count = 0
+        # coordinates are geocoded in the background, see run_workers
+        unlocated_ids = candidate_ids
+        if order.address in locations:
+            lon, lat = locations[order.address]
+            nearest_restaurants = restaurant_index.nearest(
+                lat, lon,
+                limit=settings.RESTAURANT_SEARCH_LIMIT,
+                radius_km=settings.RESTAURANT_SEARCH_RADIUS_KM,
+                predicate=candidate_ids.__contains__,
             )
-        suitable_restaurants = sorted(
-            suitable_restaurants,
-            key=lambda restaurant: restaurant.distance
-        )
-        order.suitable_restaurants = suitable_restaurants
+            for restaurant_id, restaurant_distance in nearest_restaurants:
+                order.suitable_restaurant_ids.append((
+                    restaurant_id,
+                    get_distance_with_units(restaurant_distance),
+                ))
+            unlocated_ids = candidate_ids - restaurant_index.points.keys()
+            # restaurants out of the search radius or over the limit
+            order.distant_restaurants_count = (
+                len(candidate_ids) - len(unlocated_ids)
+                - len(nearest_restaurants)
+            )
+
+        for restaurant_id in unlocated_ids:
+            order.suitable_restaurant_ids.append(
+                (restaurant_id, 'расстояние уточняется')
+            )
+
+    # only the restaurants shown on the board are loaded
+    restaurants = Restaurant.objects.in_bulk({
+        restaurant_id
+        for order in orders
+        for restaurant_id, _ in order.suitable_restaurant_ids
+    })
+    for order in orders:
+        order.suitable_restaurants = [
+            (restaurants[restaurant_id], distance)
+            for restaurant_id, distance in order.suitable_restaurant_ids
+            if restaurant_id in restaurants
+        ]
 
     return render(request, template_name='order_items.html', context={
         'orders': orders,
+        'search_radius_km': settings.RESTAURANT_SEARCH_RADIUS_KM,
     })
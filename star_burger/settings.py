@@ -1,6 +1,7 @@
 import os
 
 import rollbar
+from django.core.exceptions import ImproperlyConfigured
 
 from environs import Env
 
@@ -20,6 +21,7 @@ INSTALLED_APPS = [
     'foodcartapp.apps.FoodcartappConfig',
     'restaurateur.apps.RestaurateurConfig',
     'geolocation.apps.GeolocationConfig',
+    'jobs.apps.JobsConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -33,6 +35,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'foodcartapp.middleware.RateLimitMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -83,10 +86,29 @@ WSGI_APPLICATION = 'star_burger.wsgi.application'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = '/media/'
 
+PRODUCT_IMAGE_WIDTHS = env.list(
+    "PRODUCT_IMAGE_WIDTHS", [160, 320, 640, 1280], subcast=int
+)
+PRODUCT_IMAGE_QUALITY = env.int("PRODUCT_IMAGE_QUALITY", 80)
+
 DATABASES = {
     'default': env.dj_db_url("DATABASE_URL")
 }
 
+# geocoder counters, rate limits and catalog versions are shared between
+# web and job worker processes and rely on atomic add and incr, which only
+# the Redis and Memcached backends provide
+CACHES = {
+    'default': (env.dj_cache_url("CACHE_URL", "locmem://") if DEBUG
+                else env.dj_cache_url("CACHE_URL"))
+}
+SHARED_CACHE_BACKENDS = ('memcached', 'redis')
+if not DEBUG and not any(name in CACHES['default']['BACKEND'].lower()
+                         for name in SHARED_CACHE_BACKENDS):
+    raise ImproperlyConfigured(
+        'CACHE_URL: без DEBUG нужен общий кэш Redis или Memcached'
+    )
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -124,7 +146,68 @@ STATICFILES_DIRS = [
     os.path.join(BASE_DIR, "bundles"),
 ]
 
-YANDEX_GEOCODER_API_KEY = env.str("YANDEX_GEOCODER_API_KEY")
+YANDEX_GEOCODER_API_KEY = env.str("YANDEX_GEOCODER_API_KEY", "")
+GEOCODER = {
+    'BACKEND': env.str(
+        "GEOCODER_BACKEND", "geolocation.backends.YandexGeocoder"
+    ),
+    'OPTIONS': env.json("GEOCODER_OPTIONS", "{}"),
+}
+GEOCODER_CONNECT_TIMEOUT = env.float("GEOCODER_CONNECT_TIMEOUT", 3)
+GEOCODER_TIMEOUT = env.float("GEOCODER_TIMEOUT", 5)
+GEOCODER_RATE_LIMIT = env.float("GEOCODER_RATE_LIMIT", 10)
+GEOCODER_RATE_LIMIT_BURST = env.int("GEOCODER_RATE_LIMIT_BURST", 20)
+GEOCODER_RATE_LIMIT_MAX_WAIT = env.float("GEOCODER_RATE_LIMIT_MAX_WAIT", 2)
+GEOCODER_BREAKER_THRESHOLD = env.int("GEOCODER_BREAKER_THRESHOLD", 5)
+GEOCODER_BREAKER_WINDOW = env.int("GEOCODER_BREAKER_WINDOW", 60)
+GEOCODER_BREAKER_RECOVERY = env.int("GEOCODER_BREAKER_RECOVERY", 30)
+GEOCODER_RETRY_BUDGET = env.int("GEOCODER_RETRY_BUDGET", 3)
+GEOCODER_RETRY_BACKOFF = env.float("GEOCODER_RETRY_BACKOFF", 0.2)
+GEOCODER_BATCH_TIMEOUT = env.float("GEOCODER_BATCH_TIMEOUT", 20)
+GEOCODER_MAX_WORKERS = env.int("GEOCODER_MAX_WORKERS", 8)
+GEOCODER_LOCAL_CACHE_SIZE = env.int("GEOCODER_LOCAL_CACHE_SIZE", 1024)
+GEOCODER_LOCAL_CACHE_TTL = env.int("GEOCODER_LOCAL_CACHE_TTL", 5 * 60)
+GEOCODER_LOCATION_TTL = env.int("GEOCODER_LOCATION_TTL", 30 * 24 * 60 * 60)
+GEOCODER_NEGATIVE_TTL = env.int("GEOCODER_NEGATIVE_TTL", 24 * 60 * 60)
+REFRESH_LOCATIONS_CHECKPOINT = env.str(
+    "REFRESH_LOCATIONS_CHECKPOINT",
+    os.path.join(BASE_DIR, 'refresh_locations.checkpoint.json'),
+)
+GEO_GRID_CELL_KM = env.float("GEO_GRID_CELL_KM", 2)
+RESTAURANT_SEARCH_LIMIT = env.int("RESTAURANT_SEARCH_LIMIT", 10)
+RESTAURANT_SEARCH_RADIUS_KM = env.float("RESTAURANT_SEARCH_RADIUS_KM", 50)
+
+PRODUCTS_PAGE_SIZE = env.int("PRODUCTS_PAGE_SIZE", 20)
+PRODUCTS_PAGE_SIZE_MAX = env.int("PRODUCTS_PAGE_SIZE_MAX", 100)
+CATALOG_CHANGES_OVERLAP = env.int("CATALOG_CHANGES_OVERLAP", 5)
+CATALOG_TOMBSTONE_TTL = env.int("CATALOG_TOMBSTONE_TTL", 30 * 24 * 60 * 60)
+IDEMPOTENCY_KEY_TTL = env.int("IDEMPOTENCY_KEY_TTL", 24 * 60 * 60)
+
+ORDER_INTAKE_MODE = env.str("ORDER_INTAKE_MODE", "sync")
+ORDER_INTAKE_SPOOL_DIR = env.str(
+    "ORDER_INTAKE_SPOOL_DIR",
+    os.path.join(BASE_DIR, 'order_spool'),
+)
+ORDER_INTAKE_BATCH_SIZE = env.int("ORDER_INTAKE_BATCH_SIZE", 500)
+ORDER_INTAKE_POLL_INTERVAL = env.float("ORDER_INTAKE_POLL_INTERVAL", 0.5)
+ORDER_IMPORT_CHUNK_SIZE = env.int("ORDER_IMPORT_CHUNK_SIZE", 500)
+PHONENUMBER_CACHE_SIZE = env.int("PHONENUMBER_CACHE_SIZE", 10000)
+API_RATE_LIMITS = env.json(
+    "API_RATE_LIMITS",
+    '{"/api/products/": {"rate": 5, "burst": 30},'
+    ' "/api/order/": {"rate": 0.2, "burst": 10},'
+    ' "/api/order/status/": {"rate": 2, "burst": 20}}',
+)
+# without proxies X-Forwarded-For is sent by the clients themselves,
+# deploy_star_burger.sh sets 1 for the server behind nginx
+API_RATE_LIMIT_PROXIES = env.int("API_RATE_LIMIT_PROXIES", 0)
+
+JOB_WORKERS = env.int("JOB_WORKERS", 2)
+JOB_POLL_INTERVAL = env.float("JOB_POLL_INTERVAL", 1)
+JOB_LEASE_TIMEOUT = env.int("JOB_LEASE_TIMEOUT", 10 * 60)
+JOB_MAX_ATTEMPTS = env.int("JOB_MAX_ATTEMPTS", 5)
+JOB_RETRY_BACKOFF = env.int("JOB_RETRY_BACKOFF", 30)
+JOB_RETRY_BACKOFF_MAX = env.int("JOB_RETRY_BACKOFF_MAX", 60 * 60)
 
 ROLLBAR = {
     'access_token': env.str("ROLLBAR_ACCESS_TOKEN"),